@@ -1,30 +1,74 @@
-import os, sqlite3, csv, smtplib, time, threading, re, random
-import json
+import os, sqlite3, csv, smtplib, time, threading, re, random, cProfile
+import json, hashlib, uuid
+from functools import partial
+import click
 from email.message import EmailMessage
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from groq import Groq
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, stream_with_context, g
 from dotenv import load_dotenv
+from csv_importer import (import_inventory, import_suppliers, sync_inventory, sync_suppliers, init_bulk_insert,
+                          ROW_BY_ROW)
+from draft_worker import DraftWorkerPool
+from llm_cache import LLMCache, CachedLLMClient
+from llm_provider import LLMProvider, LazyClient, make_client, DEFAULT_MODEL
+from fake_llm import load_replies
+from gatekeeper import BatchGatekeeper
+from ingest_queue import IngestQueue, IngestWorkerPool, init_ingest_schema
+from reports_watcher import ReportsWatcher, init_watch_ledger
+from db_engine import DBEngine
+from query_context import ContextBuilder, init_search_index
+from reply_scheduler import ReplyScheduler, init_reply_schema
+from negotiation_feed import NegotiationFeed, init_negotiation_feed, current_cursor, read_feed
+from reorder_engine import ReorderEngine, init_stock_snapshots, take_snapshot, prune_snapshots
+from stock_ledger import init_stock_ledger, record_movement, item_movements, recent_imports
+from metrics import Registry, InstrumentedLLMClient, DB_BUCKETS
 
 load_dotenv()
 
 app = Flask(__name__)
 
-@app.template_filter('from_json')
-def from_json_filter(value):
-    return json.loads(value)
-
-DB_NAME = 'msme_agentic_final.db'
+DB_NAME = os.getenv('DB_PATH', 'msme_agentic_final.db')
 WATCH_DIR = 'whatsapp_logs'
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-# Ensure the watcher directory exists
-if not os.path.exists(WATCH_DIR):
-    os.makedirs(WATCH_DIR)
+# --- METRICS (Prometheus text format at /metrics) ---
+metrics = Registry()
+http_seconds = metrics.histogram('http_request_seconds', 'Flask request latency (streams: until headers are sent)',
+                                 ('route', 'method', 'status'))
+db_query_seconds = metrics.histogram('db_query_seconds', 'SQLite statement latency, to the first row',
+                                     ('verb',), DB_BUCKETS)
+llm_fallbacks = metrics.counter('llm_fallbacks_total', 'LLM failures answered with a canned fallback', ('site',))
+watcher_file_seconds = metrics.histogram('watcher_file_seconds', 'Time to handle one chat export', ('outcome',))
+
+llm_cache = LLMCache(os.getenv('LLM_CACHE_DB', 'llm_cache.db'),
+                     ttl=int(os.getenv('LLM_CACHE_TTL', 24 * 3600)),
+                     max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000)))
+# LLM_BACKEND=fake swaps Groq for the deterministic local stand-in (fake_llm.py).
+# Built on the first LLM call rather than at import, so web workers boot without the SDK.
+llm_backend = LazyClient(lambda: make_client(
+    os.getenv('LLM_BACKEND', 'groq'), api_key=os.getenv("GROQ_API_KEY"),
+    latency=float(os.getenv('FAKE_LLM_LATENCY', 0.05)),
+    jitter=float(os.getenv('FAKE_LLM_JITTER', 0)),
+    error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', 0)),
+    replies=load_replies(os.getenv('FAKE_LLM_REPLIES')) if os.getenv('FAKE_LLM_REPLIES') else (),
+    seed=int(os.getenv('FAKE_LLM_SEED', 0))))
+# Instrumented underneath the cache, so llm_request_seconds only sees calls that reached the API
+client = CachedLLMClient(InstrumentedLLMClient(llm_backend, metrics), llm_cache,
+                         bypass=filter(None, os.getenv('LLM_CACHE_BYPASS', '').split(',')), forward_site=True)
+llm = LLMProvider(client, model=os.getenv('LLM_MODEL', DEFAULT_MODEL))
+
+gatekeeper = BatchGatekeeper(llm, max_batch=int(os.getenv('GATEKEEPER_BATCH', 20)),
+                             max_wait=float(os.getenv('GATEKEEPER_MAX_WAIT', 0.05)))
 
 # --- AGENTIC AI LOGIC ---
 class SmartNegotiationAgent:
-    def draft_email(self, item_name, current_stock, threshold, supplier_name, units=500, price=None, instruction=None):
-        prompt = f"""
+    def __init__(self, llm_provider=None):
+        self._llm = llm_provider
+
+    @property
+    def llm(self):
+        return self._llm or llm
+
+    def draft_prompt(self, item_name, current_stock, threshold, supplier_name, units=500, price=None, instruction=None):
+        return f"""
         You are an MSME Procurement AI. Draft a professional restocking email.
         Item: {item_name}
         Current Stock: {current_stock}
@@ -37,50 +81,50 @@ class SmartNegotiationAgent:
         Keep the draft professional, mention that our AI systems triggered this due to low stock, and use a firm but respectful negotiation tone.
         Return ONLY the email draft (Subject and Body).
         """
+
+    def request_draft(self, item_name, current_stock, threshold, supplier_name, units=500, price=None, instruction=None):
+        """Asks the LLM for a draft. Raises on API errors (see draft_email for the safe variant)."""
+        return self.llm.complete("draft_email", self.draft_prompt(item_name, current_stock, threshold, supplier_name,
+                                                                  units, price, instruction))
+
+    def stream_draft(self, item_name, current_stock, threshold, supplier_name, units=500, price=None, instruction=None):
+        """Yields the draft text as the LLM generates it. Raises on API errors."""
+        yield from self.llm.stream("draft_email", self.draft_prompt(item_name, current_stock, threshold, supplier_name,
+                                                                    units, price, instruction))
+
+    def fallback_draft(self, item_name, current_stock, threshold, supplier_name, units=500, **_):
+        urgency = "CRITICAL" if current_stock < (threshold * 0.2) else "URGENT"
+        return (f"Subject: [{urgency}] Restock Request for {item_name}\n\n"
+                f"Dear {supplier_name},\n\n"
+                f"Our system indicates {item_name} is low ({current_stock} units). "
+                f"We need {units} units. Please provide an invoice.")
+
+    def draft_email(self, item_name, current_stock, threshold, supplier_name, units=500, price=None, instruction=None):
         try:
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return completion.choices[0].message.content
+            return self.request_draft(item_name, current_stock, threshold, supplier_name, units, price, instruction)
         except Exception as e:
-            urgency = "CRITICAL" if current_stock < (threshold * 0.2) else "URGENT"
-            return (f"Subject: [{urgency}] Restock Request for {item_name}\n\n"
-                    f"Dear {supplier_name},\n\n"
-                    f"Our system indicates {item_name} is low ({current_stock} units). "
-                    f"We need {units} units. Please provide an invoice.")
+            print(f"Draft Error: {e}")
+            llm_fallbacks.inc(site='draft_email')
+            return self.fallback_draft(item_name, current_stock, threshold, supplier_name, units)
 
 class WhatsAppAgent:
     def is_business_relevant(self, text):
-        """The Gatekeeper: Checks if a message is worth processing."""
-        prompt = f"""
-        Analyze if the following WhatsApp message contains genuine business value:
-        - Customer feedback (positive or negative)
-        - Product/Price queries
-        - New sales leads
-        - Urgent complaints or requests
-        
-        If it's just 'Hi', 'Good morning', general chatter, or noise, respond with NO.
-        If it's business relevant, respond with YES.
-        
-        Message: "{text}"
-        Answer (YES/NO):"""
-        try:
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=5
-            )
-            return "YES" in completion.choices[0].message.content.upper()
-        except:
-            return True # Fallback to processing if API fails
+        """The Gatekeeper: Checks if a message is worth processing (local pre-filter, then batched LLM check)."""
+        return gatekeeper.classify(text)
+
+    def filter_relevant(self, texts):
+        """Gatekeeper for a batch of messages: one LLM call per GATEKEEPER_BATCH unsure messages."""
+        return gatekeeper.classify_many(texts)
 
     def analyze_chat(self, raw_text):
         # First, filter the noise
         if not self.is_business_relevant(raw_text):
             print("🛑 Gatekeeper: Message ignored (Noise/General Chatter).")
             return None
+        return self.extract_insights(raw_text)
 
+    def extract_insights(self, raw_text):
+        """The analysis step of analyze_chat, for text that already passed the gatekeeper."""
         prompt = f"""
         You are an MSME Business Analyst AI. Analyze the following WhatsApp chat logs and extract key business insights.
         Return the response in strictly valid JSON format with the following keys:
@@ -94,12 +138,7 @@ class WhatsAppAgent:
         {raw_text}
         """
         try:
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            return completion.choices[0].message.content
+            return llm.complete("analyze_chat", prompt, response_format={"type": "json_object"})
         except Exception as e:
             print(f"Groq Error: {e}")
             return None
@@ -107,120 +146,343 @@ class WhatsAppAgent:
     def save_insight(self, raw_text, analysis_json):
         try:
             data = json.loads(analysis_json)
-            conn = get_db()
-            conn.execute('''INSERT INTO whatsapp_insights (raw_text, processed_json, summary, sentiment, revenue) 
-                         VALUES (?, ?, ?, ?, ?)''',
-                         (raw_text, analysis_json, data['summary'], data['sentiment'], float(data.get('revenue_potential', 0))))
-            conn.commit()
-            conn.close()
+            with get_db() as conn:
+                cur = conn.execute('''INSERT INTO whatsapp_insights (raw_text, processed_json, summary, sentiment, revenue)
+                             VALUES (?, ?, ?, ?, ?)''',
+                             (raw_text, analysis_json, data['summary'], data['sentiment'], float(data.get('revenue_potential', 0))))
+                save_insight_details(conn, cur.lastrowid, data)
             return True
         except Exception as e:
             print(f"DB Error: {e}")
             return False
 
 # --- DATABASE ENGINE ---
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+db = DBEngine(DB_NAME, on_query=lambda verb, seconds: db_query_seconds.observe(seconds, verb=verb))
+
+def get_db(write=False):
+    """This thread's pooled connection, as a context manager that commits on success.
+    `write=True` takes the write lock first (BEGIN IMMEDIATE) for read-then-write transactions."""
+    return db.connect(write)
+
+# Identifies this process as the owner of the drafts its pool is working on
+draft_owner = uuid.uuid4().hex
+
+def _after_fork():
+    # gunicorn --preload forks its workers after create_app() has used the main thread's connection
+    global draft_owner
+    db.after_fork()
+    llm_cache.after_fork()
+    draft_owner = uuid.uuid4().hex
+
+os.register_at_fork(after_in_child=_after_fork)
+
+SCHEMA_VERSION = 5 # bump whenever init_db gains a table, index, trigger or migration
 
 def init_db():
-    conn = get_db()
-    conn.execute('''CREATE TABLE IF NOT EXISTS inventory 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, mrp REAL, sp REAL, discount TEXT, cost REAL, stock INTEGER, min_limit INTEGER)''')
-    conn.execute('CREATE TABLE IF NOT EXISTS suppliers (item_name TEXT, name TEXT, email TEXT)')
-    conn.execute('''CREATE TABLE IF NOT EXISTS negotiations 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, item_name TEXT, supplier_email TEXT, 
-                  draft TEXT, invoice_amount REAL, status TEXT, units INTEGER DEFAULT 500, last_reply TEXT)''')
-    conn.execute('''CREATE TABLE IF NOT EXISTS whatsapp_insights 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, raw_text TEXT, processed_json TEXT, summary TEXT, 
-                  sentiment TEXT, revenue REAL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-    conn.commit()
-    conn.close()
+    """Creates/migrates the schema; a database already at SCHEMA_VERSION is left alone (one PRAGMA read)."""
+    with get_db() as conn:
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
+        conn.execute('''CREATE TABLE IF NOT EXISTS inventory 
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, mrp REAL, sp REAL, discount TEXT, cost REAL, stock INTEGER, min_limit INTEGER)''')
+        conn.execute('CREATE TABLE IF NOT EXISTS suppliers (item_name TEXT, name TEXT, email TEXT)')
+        init_bulk_insert(conn)
+        conn.execute('''CREATE TABLE IF NOT EXISTS negotiations 
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, item_name TEXT, supplier_email TEXT, 
+                      draft TEXT, invoice_amount REAL, status TEXT, units INTEGER DEFAULT 500, last_reply TEXT)''')
+        columns = {r[1] for r in conn.execute('PRAGMA table_info(negotiations)')}
+        if 'draft_requested_at' not in columns:
+            conn.execute('ALTER TABLE negotiations ADD COLUMN draft_requested_at REAL')
+        if 'draft_owner' not in columns:
+            conn.execute('ALTER TABLE negotiations ADD COLUMN draft_owner TEXT')
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_negotiations_draft_pending ON negotiations(draft_requested_at)
+                        WHERE status = 'DRAFT_PENDING' ''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS whatsapp_insights 
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, raw_text TEXT, processed_json TEXT, summary TEXT, 
+                      sentiment TEXT, revenue REAL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+        # Indexes backing the dashboard/inventory aggregates and pagination
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory(name)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_low_stock ON inventory(name) WHERE stock < min_limit')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_value ON inventory(stock * cost)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_suppliers_item ON suppliers(item_name)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_insights_timestamp ON whatsapp_insights(timestamp, id)')
+        init_insight_details(conn)
+        init_kpi_summary(conn)
+        init_ingest_schema(conn)
+        init_watch_ledger(conn)
+        init_search_index(conn)
+        init_reply_schema(conn)
+        init_negotiation_feed(conn)
+        init_stock_snapshots(conn)
+        init_stock_ledger(conn)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+# --- INSIGHT DETAILS (leads/urgent tasks normalized at save time, so /reports never parses JSON) ---
+def init_insight_details(conn):
+    new_tables = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'insight_leads'").fetchone()
+    conn.execute('''CREATE TABLE IF NOT EXISTS insight_leads
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, insight_id INTEGER NOT NULL, lead TEXT NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS insight_tasks
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, insight_id INTEGER NOT NULL, task TEXT NOT NULL)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_insight_leads_insight ON insight_leads(insight_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_insight_tasks_insight ON insight_tasks(insight_id)')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS insight_details_delete AFTER DELETE ON whatsapp_insights BEGIN
+                        DELETE FROM insight_leads WHERE insight_id = old.id;
+                        DELETE FROM insight_tasks WHERE insight_id = old.id; END''')
+    if new_tables: # one-off backfill for insights saved before the tables existed
+        for insight_id, analysis_json in conn.execute('SELECT id, processed_json FROM whatsapp_insights').fetchall():
+            try:
+                save_insight_details(conn, insight_id, json.loads(analysis_json or '{}'))
+            except (ValueError, AttributeError):
+                pass
+
+def save_insight_details(conn, insight_id, data):
+    as_text = lambda v: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+    conn.executemany('INSERT INTO insight_leads (insight_id, lead) VALUES (?, ?)',
+                     [(insight_id, as_text(lead)) for lead in data.get('leads') or []])
+    conn.executemany('INSERT INTO insight_tasks (insight_id, task) VALUES (?, ?)',
+                     [(insight_id, as_text(task)) for task in data.get('urgent_tasks') or []])
+
+# --- KPI SUMMARY (materialized, kept current by triggers) ---
+KPI_FIELDS = ('total_items', 'total_value', 'low_stock', 'potential_revenue', 'positive', 'neutral', 'negative')
+
+def _kpi_delta_sql(sign, row):
+    """SET-clause fragments adding (sign=+) or removing (sign=-) one row's contribution."""
+    return {
+        'inventory': f'''total_items = total_items {sign} 1,
+            total_value = total_value {sign} COALESCE({row}.stock * {row}.cost, 0),
+            low_stock = low_stock {sign} COALESCE({row}.stock < {row}.min_limit, 0)''',
+        'whatsapp_insights': f'''potential_revenue = potential_revenue {sign} COALESCE({row}.revenue, 0),
+            positive = positive {sign} ({row}.sentiment IS 'Positive'),
+            neutral = neutral {sign} ({row}.sentiment IS 'Neutral'),
+            negative = negative {sign} ({row}.sentiment IS 'Negative')''',
+    }
+
+def init_kpi_summary(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS kpi_summary 
+                 (id INTEGER PRIMARY KEY CHECK (id = 1), total_items INTEGER NOT NULL DEFAULT 0, 
+                  total_value REAL NOT NULL DEFAULT 0, low_stock INTEGER NOT NULL DEFAULT 0, 
+                  potential_revenue REAL NOT NULL DEFAULT 0, positive INTEGER NOT NULL DEFAULT 0, 
+                  neutral INTEGER NOT NULL DEFAULT 0, negative INTEGER NOT NULL DEFAULT 0)''')
+    for table in ('inventory', 'whatsapp_insights'):
+        add, remove = _kpi_delta_sql('+', 'NEW')[table], _kpi_delta_sql('-', 'OLD')[table]
+        # Bulk inventory loads skip the per-row update; kpi_inventory_bulk applies their delta at once
+        when = f'WHEN {ROW_BY_ROW}' if table == 'inventory' else ''
+        conn.execute(f'DROP TRIGGER IF EXISTS kpi_{table}_insert')
+        conn.execute(f'''CREATE TRIGGER kpi_{table}_insert AFTER INSERT ON {table} {when}
+                     BEGIN UPDATE kpi_summary SET {add} WHERE id = 1; END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS kpi_{table}_delete AFTER DELETE ON {table} 
+                     BEGIN UPDATE kpi_summary SET {remove} WHERE id = 1; END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS kpi_{table}_update AFTER UPDATE ON {table} 
+                     BEGIN UPDATE kpi_summary SET {remove} WHERE id = 1; 
+                           UPDATE kpi_summary SET {add} WHERE id = 1; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS kpi_inventory_bulk AFTER UPDATE OF active ON inventory_bulk
+                 WHEN old.active AND NOT new.active BEGIN
+                 UPDATE kpi_summary SET (total_items, total_value, low_stock) =
+                     (SELECT kpi_summary.total_items + COUNT(*),
+                             kpi_summary.total_value + COALESCE(SUM(i.stock * i.cost), 0),
+                             kpi_summary.low_stock + COALESCE(SUM(i.stock < i.min_limit), 0)
+                      FROM inventory i WHERE i.id > old.after_id)
+                 WHERE id = 1; END''')
+    # First run on an existing database: seed the summary from the base tables
+    if conn.execute('INSERT OR IGNORE INTO kpi_summary (id) VALUES (1)').rowcount:
+        rebuild_kpi_summary(conn)
+
+def compute_kpis(conn):
+    """Recompute every KPI from scratch over the base tables."""
+    inv = conn.execute('''SELECT COUNT(*), COALESCE(SUM(stock * cost), 0), 
+                                 COALESCE(SUM(stock < min_limit), 0) FROM inventory''').fetchone()
+    ins = conn.execute('''SELECT COALESCE(SUM(revenue), 0), 
+                                 COALESCE(SUM(sentiment IS 'Positive'), 0), 
+                                 COALESCE(SUM(sentiment IS 'Neutral'), 0), 
+                                 COALESCE(SUM(sentiment IS 'Negative'), 0) FROM whatsapp_insights''').fetchone()
+    return dict(zip(KPI_FIELDS, tuple(inv) + tuple(ins)))
+
+def read_kpis(conn):
+    try:
+        row = conn.execute(f'SELECT {", ".join(KPI_FIELDS)} FROM kpi_summary WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        row = None # Database predates kpi_summary; init_db() creates it at the next boot
+    return dict(row) if row else compute_kpis(conn)
+
+def rebuild_kpi_summary(conn):
+    kpis = compute_kpis(conn)
+    conn.execute(f'''INSERT OR REPLACE INTO kpi_summary (id, {", ".join(KPI_FIELDS)}) 
+                     VALUES (1, {", ".join("?" * len(KPI_FIELDS))})''', tuple(kpis.values()))
+    return kpis
+
+def check_kpi_summary(conn, tolerance=0.01):
+    """Returns {field: (stored, actual)} for every KPI that drifted from the base tables."""
+    stored, actual = read_kpis(conn), compute_kpis(conn)
+    return {f: (stored[f], actual[f]) for f in KPI_FIELDS if abs(stored[f] - actual[f]) > tolerance}
+
+@app.cli.command('import-csv')
+@click.option('--inventory', 'inv_path', type=click.Path(exists=True, dir_okay=False), help='Inventory CSV file.')
+@click.option('--suppliers', 'sup_path', type=click.Path(exists=True, dir_okay=False), help='Supplier CSV file.')
+@click.option('--append', is_flag=True, help='Insert every row as-is instead of diffing against the current tables.')
+def import_csv_command(inv_path, sup_path, append):
+    """Offline bulk load of inventory/supplier CSVs in a single transaction.
+
+    By default each file is diffed against the current table: only changed rows
+    are written and stock changes go to the movement ledger.
+    """
+    init_db()
+    importers = ((inv_path, 'inventory', import_inventory if append else partial(sync_inventory, source='cli')),
+                 (sup_path, 'suppliers', import_suppliers if append else sync_suppliers))
+    with get_db(write=True) as conn:
+        for path, table, importer in importers:
+            if not path:
+                continue
+            moved, = conn.execute('SELECT COALESCE(MAX(id), 0) FROM stock_movements').fetchone()
+            with open(path, 'rb') as f:
+                report = importer(conn, f)
+            click.echo(str(report))
+            if table == 'inventory':
+                # Appends have no ledger rows to go by, so they snapshot every item
+                take_snapshot(conn, 'import', movements_after=None if append else moved)
+            for line_no, reason in report.errors:
+                click.echo(f"  line {line_no}: {reason}")
+
+@app.cli.command('ingest-requeue')
+def ingest_requeue_command():
+    """Move dead-lettered webhook messages back onto the ingest queue."""
+    click.echo(f"{ingest_queue.requeue_dead()} dead-lettered messages requeued.")
+
+@app.cli.command('kpi-check')
+@click.option('--rebuild', is_flag=True, help='Rebuild kpi_summary from the base tables if it drifted.')
+def kpi_check_command(rebuild):
+    """Verify the materialized KPI summary against the base tables."""
+    init_db()
+    with get_db() as conn:
+        drift = check_kpi_summary(conn)
+        for field, (stored, actual) in drift.items():
+            click.echo(f"DRIFT {field}: stored={stored} actual={actual}")
+        if drift and rebuild:
+            rebuild_kpi_summary(conn)
+            click.echo("kpi_summary rebuilt.")
+        elif not drift:
+            click.echo("kpi_summary is consistent.")
+    if drift and not rebuild:
+        raise SystemExit(1)
+
+# A DRAFT_PENDING row is leased to the process drafting it: `draft_owner` names the process and
+# `draft_requested_at` is renewed when a pool thread starts the job. Drafts live in that process's pool;
+# if it goes away (gunicorn recycling a worker, a deploy), the lease runs out after DRAFT_STALE_AFTER
+# seconds and the background worker takes the row over.
+DRAFT_STALE_AFTER = float(os.getenv('DRAFT_STALE_AFTER', 900))
+
+def claim_negotiation_draft(neg_id):
+    """Draft pool callback as a job starts: renews this process's lease, False if the row moved on or was taken over."""
+    with get_db() as conn:
+        return conn.execute('''UPDATE negotiations SET draft_requested_at = ?
+                               WHERE id = ? AND status = 'DRAFT_PENDING' AND draft_owner = ? RETURNING id''',
+                            (time.time(), neg_id, draft_owner)).fetchone() is not None
+
+def save_negotiation_draft(neg_id, draft):
+    """Draft pool callback: fills in a DRAFT_PENDING negotiation this process still owns once its draft is ready."""
+    with get_db() as conn:
+        conn.execute('''UPDATE negotiations SET draft = ?, status = 'AWAITING_HUMAN', draft_owner = NULL
+                        WHERE id = ? AND status = 'DRAFT_PENDING' AND draft_owner = ?''', (draft, neg_id, draft_owner))
+
+draft_pool = DraftWorkerPool(SmartNegotiationAgent(), save_negotiation_draft,
+                             max_workers=int(os.getenv('DRAFT_CONCURRENCY', 4)), claim=claim_negotiation_draft)
+
+def resume_stale_drafts(stale_after=DRAFT_STALE_AFTER):
+    """Takes over and re-submits DRAFT_PENDING negotiations whose lease expired; returns how many."""
+    now = time.time()
+    with get_db() as conn:
+        claimed = [r[0] for r in conn.execute('''UPDATE negotiations SET draft_requested_at = ?, draft_owner = ?
+                                                 WHERE status = 'DRAFT_PENDING' AND COALESCE(draft_requested_at, 0) < ?
+                                                   AND draft_owner IS NOT ? -- still queued in this process's own pool
+                                                 RETURNING id''', (now, draft_owner, now - stale_after, draft_owner))]
+        jobs = conn.execute('''SELECT n.id, n.item_name, n.units,
+                                      (SELECT stock FROM inventory WHERE name = n.item_name ORDER BY id LIMIT 1) AS stock,
+                                      (SELECT min_limit FROM inventory WHERE name = n.item_name ORDER BY id LIMIT 1) AS min_limit,
+                                      (SELECT name FROM suppliers WHERE item_name = n.item_name AND email IS n.supplier_email
+                                       LIMIT 1) AS s_name
+                               FROM negotiations n WHERE n.id IN (SELECT value FROM json_each(?))''',
+                            (json.dumps(claimed),)).fetchall()
+    for job in jobs:
+        draft_pool.submit(job['id'], job['item_name'], job['stock'] or 0, job['min_limit'] or 0,
+                          job['s_name'] or 'Supplier', units=job['units'] or 500)
+    return len(jobs)
+
+def stale_draft_sweeper(interval=60.0):
+    """Background thread: resumes orphaned drafts at startup and then every `interval` seconds."""
+    while True:
+        try:
+            resumed = resume_stale_drafts()
+            if resumed:
+                print(f"📝 Resumed {resumed} stale draft(s).")
+        except Exception as e:
+            print(f"Stale Draft Sweep Error: {e}")
+        time.sleep(interval)
 
 def send_mail(to_email, subject, body, from_email="procurement@msme-os.ai"):
     # Mock mail sending - can be replaced with real SMTP if needed
     print(f"Sending mail to {to_email} | Subject: {subject}")
     return True
 
-def simulate_agent_read(item_name, supplier_email):
-    time.sleep(5) 
-    conn = get_db()
-    neg = conn.execute('SELECT * FROM negotiations WHERE item_name=? AND status="INQUIRY_SENT"', (item_name,)).fetchone()
-    if neg:
-        raw_reply = f"Hi, confirming we have {neg['units']} units available for ₹{neg['invoice_amount']}. Ready to ship."
-        
-        try:
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are an AI analyzing supplier emails. Extract the key sentiment and confirmation."},
-                    {"role": "user", "content": f"Analyze this reply: {raw_reply}"}
-                ],
-            )
-            analysis = completion.choices[0].message.content
-        except:
-            analysis = "Invoice data validated. Stock is ready for shipment."
-
-        display_text = f"{analysis}"
-        conn.execute('UPDATE negotiations SET status="INVOICE_RECEIVED", last_reply=? WHERE id=?', (display_text, neg['id']))
-        conn.commit()
-    conn.close()
+def simulate_agent_read(neg):
+    """Reads the (simulated) supplier reply for one negotiation; the scheduler marks it INVOICE_RECEIVED."""
+    raw_reply = f"Hi, confirming we have {neg['units']} units available for ₹{neg['invoice_amount']}. Ready to ship."
+    
+    try:
+        analysis = llm.complete("simulate_agent_read", [
+            {"role": "system", "content": "You are an AI analyzing supplier emails. Extract the key sentiment and confirmation."},
+            {"role": "user", "content": f"Analyze this reply: {raw_reply}"}
+        ])
+    except Exception as e:
+        print(f"Supplier Reply Error: {e}")
+        llm_fallbacks.inc(site='simulate_agent_read')
+        analysis = "Invoice data validated. Stock is ready for shipment."
+
+    return f"{analysis}"
+
+# Supplier replies arrive SUPPLIER_REPLY_DELAY seconds after an inquiry, handled by a fixed pool
+reorder_engine = ReorderEngine(lead_time_days=float(os.getenv('REORDER_LEAD_TIME_DAYS', 7)),
+                               service_level=float(os.getenv('REORDER_SERVICE_LEVEL', 0.95)),
+                               order_cost=float(os.getenv('REORDER_ORDER_COST', 500)),
+                               holding_rate=float(os.getenv('REORDER_HOLDING_RATE', 0.25)),
+                               history_days=int(os.getenv('REORDER_HISTORY_DAYS', 90)))
+
+SUPPLIER_REPLY_DELAY = float(os.getenv('SUPPLIER_REPLY_DELAY', 5))
+reply_scheduler = ReplyScheduler(get_db, simulate_agent_read, workers=int(os.getenv('REPLY_WORKERS', 4)),
+                                 poll_interval=float(os.getenv('REPLY_POLL_INTERVAL', 1)))
+if os.getenv('REPLY_SWEEP_INTERVAL'):
+    print("⚠️ REPLY_SWEEP_INTERVAL is no longer read; the reply scheduler uses REPLY_POLL_INTERVAL")
 
 def autonomous_reports_watcher():
     """Background thread that watches a folder for new WhatsApp logs."""
-    agent = WhatsAppAgent()
-    print(f"🤖 Agentic Reports Watcher started. Watching '{WATCH_DIR}'...")
-    
-    while True:
-        try:
-            if not os.path.exists(WATCH_DIR): os.makedirs(WATCH_DIR)
-            files = [f for f in os.listdir(WATCH_DIR) if f.endswith('.txt')]
-            for file in files:
-                file_path = os.path.join(WATCH_DIR, file)
-                print(f"📥 New log detected: {file}. Processing autonomously...")
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    raw_text = f.read()
-                
-                analysis = agent.analyze_chat(raw_text)
-                if analysis:
-                    if agent.save_insight(raw_text, analysis):
-                        print(f"✅ Successfully processed {file}. Removing from watch folder.")
-                        os.remove(file_path)
-                
-            time.sleep(10) # Check every 10 seconds
-        except Exception as e:
-            print(f"Watcher Error: {e}")
-            time.sleep(10)
+    reports_watcher.run()
+
+reports_watcher = ReportsWatcher(WATCH_DIR, get_db, WhatsAppAgent(),
+                                 workers=int(os.getenv('WATCHER_WORKERS', 4)),
+                                 chunk_workers=int(os.getenv('WATCHER_CHUNK_WORKERS', 4)),
+                                 chunk_chars=int(os.getenv('WATCHER_CHUNK_CHARS', 4000)),
+                                 on_file=lambda outcome, seconds: watcher_file_seconds.observe(seconds, outcome=outcome))
 
 @app.route('/')
 def dashboard():
-    if not os.path.exists(DB_NAME): init_db()
-    conn = get_db()
-    
-    # KPIs
-    all_items = conn.execute('SELECT * FROM inventory').fetchall()
-    total_val = sum(item['stock'] * item['cost'] for item in all_items)
-    low_stock = len([i for i in all_items if i['stock'] < i['min_limit']])
-    total_items = len(all_items)
+    with get_db() as conn:
+        # KPIs (precomputed in kpi_summary)
+        kpi = read_kpis(conn)
+        # Chart Data
+        # 1. Stock Levels (Top 5 by Value)
+        top_items = conn.execute('''SELECT name, stock, stock * cost AS value FROM inventory 
+                                   ORDER BY stock * cost DESC LIMIT 5''').fetchall()
+    total_val = kpi['total_value']
+    low_stock = kpi['low_stock']
+    total_items = kpi['total_items']
+    pot_rev = kpi['potential_revenue']
     
-    insights = conn.execute('SELECT * FROM whatsapp_insights').fetchall()
-    pot_rev = sum(i['revenue'] for i in insights if i['revenue'])
-    
-    # Chart Data
-    # 1. Stock Levels (Top 5 by Value)
-    sorted_items = sorted(all_items, key=lambda x: x['stock'] * x['cost'], reverse=True)[:5]
-    chart_labels = [i['name'] for i in sorted_items]
-    chart_stock = [i['stock'] for i in sorted_items]
-    chart_value = [i['stock'] * i['cost'] for i in sorted_items]
+    chart_labels = [i['name'] for i in top_items]
+    chart_stock = [i['stock'] for i in top_items]
+    chart_value = [i['value'] for i in top_items]
     
     # 2. Sentiment Donut
-    pos = len([i for i in insights if i['sentiment'] == 'Positive'])
-    neu = len([i for i in insights if i['sentiment'] == 'Neutral'])
-    neg = len([i for i in insights if i['sentiment'] == 'Negative'])
+    pos, neu, neg = kpi['positive'], kpi['neutral'], kpi['negative']
     
-    conn.close()
     return render_template('dashboard.html', 
                            total_val=f"₹{total_val:,.2f}", 
                            low_stock=low_stock,
@@ -231,73 +493,88 @@ def dashboard():
                            chart_value=chart_value,
                            sentiment_data=[pos, neu, neg])
 
-@app.route('/ai-query', methods=['POST'])
-def ai_query():
-    data = request.json
-    query = data.get('query')
-    if not query: return jsonify({"answer": "Please ask something!"})
-    
-    conn = get_db()
-    items = conn.execute('SELECT name, stock, cost, min_limit FROM inventory').fetchall()
-    insights = conn.execute('SELECT summary, sentiment, revenue FROM whatsapp_insights').fetchall()
-    conn.close()
-    
-    # Convert data to context
-    data_context = "Inventory:\n"
-    for i in items:
-        data_context += f"- {i['name']}: {i['stock']} units, Cost: ₹{i['cost']}\n"
-    
-    data_context += "\nInsights:\n"
-    for ins in insights:
-        data_context += f"- {ins['summary']} (Sentiment: {ins['sentiment']}, Potential: ₹{ins['revenue']})\n"
+# Only the rows relevant to the question (FTS5 + kpi_summary) go into the prompt
+context_builder = ContextBuilder(token_budget=int(os.getenv('AI_QUERY_TOKEN_BUDGET', 1500)),
+                                 top_k=int(os.getenv('AI_QUERY_TOP_K', 20)))
+
+def wants_stream():
+    """Clients opt into server-sent events with `Accept: text/event-stream`; everyone else gets JSON."""
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def ai_query_prompt(query):
+    with get_db() as conn:
+        data_context, _ = context_builder.build(conn, query, read_kpis(conn))
 
-    prompt = f"""
+    return f"""
     You are a Data Analyst AI for an MSME. Answer user questions DIRECTLY using provided data.
     IMPORTANT: Give ONLY the final answer. No "The answer is...", no preamble, no conversation.
     If they ask for a list, use bullets. If it's a number, just give the number.
+    Use the Totals for counts and sums; the other lists only show the rows most relevant to the question.
     
     DATA:
     {data_context}
 
     USER QUESTION: {query}
     """
+
+@app.route('/ai-query', methods=['POST'])
+def ai_query():
+    data = request.json
+    query = data.get('query')
+    if not query: return jsonify({"answer": "Please ask something!"})
     
+    prompt = ai_query_prompt(query)
+    if wants_stream():
+        def events():
+            answer = ""
+            try:
+                for piece in llm.stream("ai_query", prompt):
+                    answer += piece
+                    yield sse('token', {"text": piece})
+            except Exception as e:
+                print(f"AI Query Stream Error: {e}")
+                if not answer:
+                    llm_fallbacks.inc(site='ai_query')
+                    answer = "Bhai, AI server is busy!"
+            yield sse('done', {"answer": answer.strip()})
+        return sse_response(events())
+
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-        )
-        return jsonify({"answer": completion.choices[0].message.content.strip()})
-    except:
+        return jsonify({"answer": llm.complete("ai_query", prompt).strip()})
+    except Exception as e:
+        print(f"AI Query Error: {e}")
+        llm_fallbacks.inc(site='ai_query')
         return jsonify({"answer": "Bhai, AI server is busy!"})
 
 @app.route('/inventory')
 def inventory():
-    if not os.path.exists(DB_NAME): init_db()
-    conn = get_db()
-    
-    # Fetch all items for calculation
-    all_items = conn.execute('SELECT * FROM inventory').fetchall()
-    total_inventory_value = sum(item['stock'] * item['cost'] for item in all_items)
-    low_stock_items_db = [item for item in all_items if item['stock'] < item['min_limit']]
-    low_stock_count = len(low_stock_items_db)
-    
-    # Pagination logic
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     per_page = 10
-    start = (page - 1) * per_page
-    paginated_items = all_items[start:start+per_page]
-    total_pages = (len(all_items) + per_page - 1) // per_page if all_items else 1
+    with get_db() as conn:
+        # KPIs (precomputed in kpi_summary)
+        kpi = read_kpis(conn)
+        # Pagination logic
+        paginated_items = conn.execute('SELECT * FROM inventory ORDER BY id LIMIT ? OFFSET ?',
+                                       (per_page, (page - 1) * per_page)).fetchall()
+        # Fetch negotiations for low stock items; the modal then follows the change feed from this cursor
+        feed_cursor = current_cursor(conn)
+        negs = conn.execute('SELECT * FROM negotiations WHERE status != "ORDER_PLACED"').fetchall()
     
-    # Fetch negotiations for low stock items
-    negs = conn.execute('SELECT * FROM negotiations WHERE status != "ORDER_PLACED"').fetchall()
-    
-    conn.close()
+    total_inventory_value, total_count = kpi['total_value'], kpi['total_items']
+    low_stock_count = kpi['low_stock']
+    total_pages = max((total_count + per_page - 1) // per_page, 1)
     
     return render_template('inventory.html', 
                            items=paginated_items, 
-                           low_stock_items=low_stock_items_db,
                            negotiations=negs,
+                           feed_cursor=feed_cursor,
                            page=page, 
                            total_pages=total_pages,
                            total_value=f"₹{total_inventory_value:,.2f}",
@@ -309,69 +586,57 @@ def upload_all():
     inv_file = request.files.get('inventory')
     sup_file = request.files.get('suppliers')
     if inv_file and sup_file:
-        init_db() # Ensure tables exist
-        conn = get_db()
-        # Simple reset for demo purposes
-        conn.execute('DELETE FROM inventory')
-        conn.execute('DELETE FROM suppliers')
-        conn.execute('DELETE FROM negotiations')
-        
-        # Save and process inventory
-        inv_file.save('temp_inv.csv')
-        with open('temp_inv.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Flexible header mapping
-                name = row.get('item') or row.get('name') or row.get('Item Name')
-                cost = float(row.get('price') or row.get('cost') or row.get('Cost Price') or 0)
-                mrp = float(row.get('mrp') or row.get('MRP') or 0)
-                sp = float(row.get('sp') or row.get('Selling Price') or 0)
-                stock = int(row.get('stock') or row.get('Stock') or 0)
-                min_limit = int(row.get('min_limit') or row.get('Threshold') or row.get('Min Limit') or 10)
-                discount = row.get('discount') or row.get('Discount') or '0%'
-                
-                if name:
-                    conn.execute('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit) 
-                                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                                 (name, mrp, sp, discount, cost, stock, min_limit))
-        
-        # Save and process suppliers
-        sup_file.save('temp_sup.csv')
-        with open('temp_sup.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                item = row.get('item') or row.get('item_name') or row.get('Product')
-                s_name = row.get('supplier_name') or row.get('Supplier') or row.get('Name')
-                s_email = row.get('supplier_email') or row.get('Email') or row.get('Contact')
-                if item and s_name:
-                    conn.execute('INSERT INTO suppliers VALUES (?, ?, ?)', (item, s_name, s_email))
-        
-        # Auto-trigger negotiations for low stock items
-        agent = SmartNegotiationAgent()
-        low_items = conn.execute('''SELECT i.*, s.name as s_name, s.email 
-                                 FROM inventory i 
-                                 JOIN suppliers s ON i.name=s.item_name 
-                                 WHERE i.stock < i.min_limit''').fetchall()
-        for item in low_items:
-            ai_draft = agent.draft_email(item['name'], item['stock'], item['min_limit'], item['s_name'])
-            conn.execute('''INSERT INTO negotiations (item_name, supplier_email, draft, status, invoice_amount) 
-                         VALUES (?, ?, ?, ?, ?)''',
-                         (item['name'], item['email'], ai_draft, "AWAITING_HUMAN", item['cost']*500))
+        # The diff reads inventory before its first write: hold the write lock from the start so a
+        # commit from another process (ingest workers, watcher) can't invalidate the snapshot
+        with get_db(write=True) as conn:
+            # Diff both files against the current tables: only changed rows are written,
+            # and negotiations already in flight are left alone
+            moved, = conn.execute('SELECT COALESCE(MAX(id), 0) FROM stock_movements').fetchone()
+            inv_report, sup_report = sync_inventory(conn, inv_file), sync_suppliers(conn, sup_file)
+            for report in (inv_report, sup_report):
+                print(f"📦 Import {report}")
+                for line_no, reason in report.errors:
+                    print(f"   ⚠️ {report.table} line {line_no}: {reason}")
+            # Only the items whose stock this import moved get a snapshot
+            take_snapshot(conn, 'import', movements_after=moved)
+            prune_snapshots(conn, reorder_engine.history_days)
         
-        conn.commit()
-        conn.close()
+            # Auto-trigger negotiations for items this import pushed below min_limit (and with
+            # no negotiation still open): rows go in as DRAFT_PENDING right away and the worker
+            # pool fills in the LLM drafts in the background.
+            # Order sizes come from the reorder plan (EOQ / safety stock) rather than a flat 500.
+            low_items = conn.execute('''SELECT i.*, s.name as s_name, s.email 
+                                     FROM inventory i 
+                                     JOIN suppliers s ON i.name=s.item_name 
+                                     WHERE i.name IN (SELECT value FROM json_each(?))
+                                       AND NOT EXISTS (SELECT 1 FROM negotiations n
+                                                       WHERE n.item_name = i.name AND n.status != 'ORDER_PLACED')''',
+                                     (json.dumps(inv_report.newly_low),)).fetchall()
+            plan = reorder_engine.plan_inventory(conn, [item['id'] for item in low_items])
+            jobs = []
+            for item in low_items:
+                units = plan.row(item['id'])['units']
+                cur = conn.execute('''INSERT INTO negotiations (item_name, supplier_email, draft, status, invoice_amount, units,
+                                                                draft_requested_at, draft_owner) 
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                             (item['name'], item['email'], None, "DRAFT_PENDING", (item['cost'] or 0) * units, units,
+                              time.time(), draft_owner))
+                jobs.append((cur.lastrowid, item, units))
+        for neg_id, item, units in jobs:
+            draft_pool.submit(neg_id, item['name'], item['stock'], item['min_limit'], item['s_name'], units=units)
+    reorder_plan_cache.clear()
     return redirect(url_for('inventory'))
 
 @app.route('/edit-agent', methods=['POST'])
 def edit_agent():
     data = request.json
     neg_id, instruction = data['id'], data['instruction'].lower()
-    conn = get_db()
-    neg_detail = conn.execute('''SELECT n.*, i.stock, i.min_limit, i.cost, s.name 
-                                FROM negotiations n 
-                                JOIN inventory i ON n.item_name = i.name 
-                                JOIN suppliers s ON n.item_name = s.item_name 
-                                WHERE n.id=?''', (neg_id,)).fetchone()
+    with get_db() as conn:
+        neg_detail = conn.execute('''SELECT n.*, i.stock, i.min_limit, i.cost, s.name 
+                                    FROM negotiations n 
+                                    JOIN inventory i ON n.item_name = i.name 
+                                    JOIN suppliers s ON n.item_name = s.item_name 
+                                    WHERE n.id=?''', (neg_id,)).fetchone()
     
     if not neg_detail:
         return jsonify({"success": False, "error": "Negotiation not found"})
@@ -386,49 +651,170 @@ def edit_agent():
     new_price = (neg_detail['cost'] * new_units) * discount
     
     agent = SmartNegotiationAgent()
-    updated_draft = agent.draft_email(neg_detail['item_name'], neg_detail['stock'], neg_detail['min_limit'], neg_detail['name'], 
-                                     units=new_units, price=new_price, instruction=instruction)
-    
-    conn.execute('UPDATE negotiations SET draft=?, units=?, invoice_amount=? WHERE id=?', (updated_draft, new_units, new_price, neg_id))
-    conn.commit()
-    conn.close()
+    draft_args = (neg_detail['item_name'], neg_detail['stock'], neg_detail['min_limit'], neg_detail['name'], new_units)
+
+    def save(updated_draft):
+        with get_db() as conn:
+            conn.execute('UPDATE negotiations SET draft=?, units=?, invoice_amount=? WHERE id=?', (updated_draft, new_units, new_price, neg_id))
+
+    if wants_stream():
+        def events():
+            pieces = []
+            try:
+                for piece in agent.stream_draft(*draft_args, price=new_price, instruction=instruction):
+                    pieces.append(piece)
+                    yield sse('token', {"text": piece})
+                updated_draft = "".join(pieces)
+            except Exception as e:
+                print(f"Draft Stream Error: {e}")
+                llm_fallbacks.inc(site='draft_email')
+                updated_draft = agent.fallback_draft(*draft_args)
+            # Only a finished draft is written, in one UPDATE; a dropped connection leaves the old draft in place
+            save(updated_draft)
+            yield sse('done', {"success": True, "new_draft": updated_draft})
+        return sse_response(events())
+
+    updated_draft = agent.draft_email(*draft_args, price=new_price, instruction=instruction)
+    save(updated_draft)
     return jsonify({"success": True, "new_draft": updated_draft})
 
+def send_inquiries(ids):
+    """Mails each AWAITING_HUMAN negotiation's draft and schedules its supplier reply; returns how many were sent."""
+    due_at = time.time() + SUPPLIER_REPLY_DELAY
+    sent = []
+    with get_db() as conn:
+        for start in range(0, len(ids), 500): # stay under SQLite's bound-parameter limit
+            chunk = ids[start:start + 500]
+            negs = conn.execute(f'''SELECT id, item_name, supplier_email, draft FROM negotiations 
+                                    WHERE status = 'AWAITING_HUMAN' AND id IN ({", ".join("?" * len(chunk))})''', chunk).fetchall()
+            for neg in negs:
+                send_mail(neg['supplier_email'], f"Supply Inquiry: {neg['item_name']}", neg['draft'])
+                sent.append(neg['id'])
+        conn.executemany('UPDATE negotiations SET status="INQUIRY_SENT", reply_due_at=? WHERE id=?',
+                         [(due_at, neg_id) for neg_id in sent])
+    reply_scheduler.schedule((neg_id, due_at) for neg_id in sent)
+    return len(sent)
+
 @app.route('/send-inquiry/<int:id>', methods=['POST'])
 def send_inquiry(id):
-    conn = get_db()
-    neg = conn.execute('SELECT * FROM negotiations WHERE id=?', (id,)).fetchone()
-    if neg:
-        send_mail(neg['supplier_email'], f"Supply Inquiry: {neg['item_name']}", neg['draft'])
-        conn.execute('UPDATE negotiations SET status="INQUIRY_SENT" WHERE id=?', (id,))
-        conn.commit()
-        threading.Thread(target=simulate_agent_read, args=(neg['item_name'], neg['supplier_email'])).start()
-    conn.close()
+    send_inquiries([id])
     return redirect(url_for('inventory'))
 
+@app.route('/send-inquiries', methods=['POST'])
+def send_all_inquiries():
+    """Bulk send: the JSON body's `ids`, or every negotiation awaiting approval."""
+    body = request.get_json(silent=True) or {}
+    ids = body.get('ids') if isinstance(body, dict) else None
+    if not isinstance(body, dict) or 'ids' in body and not (
+            isinstance(ids, list) and all(type(i) is int or isinstance(i, str) and i.isdigit() for i in ids)):
+        return jsonify({"success": False, "error": "ids must be a list of negotiation ids"}), 400
+    if ids is None:
+        with get_db() as conn:
+            ids = [r[0] for r in conn.execute('SELECT id FROM negotiations WHERE status = "AWAITING_HUMAN"')]
+    sent = send_inquiries([int(i) for i in ids])
+    if request.is_json:
+        return jsonify({"sent": sent})
+    return redirect(url_for('inventory'))
+
+# --- NEGOTIATION FEED (deltas since a cursor, for the inventory modal) ---
+negotiation_feed = NegotiationFeed(get_db)
+
+def negotiation_delta(since):
+    """read_feed() plus each visible card pre-rendered, so the page swaps cards without re-fetching itself."""
+    with get_db() as conn:
+        delta = read_feed(conn, since)
+    for n in delta['changes']:
+        n['html'] = render_template('_negotiation_card.html', n=n) if n['status'] != 'ORDER_PLACED' else None
+    return delta
+
+@app.route('/negotiations/feed')
+def negotiations_feed():
+    return jsonify(negotiation_delta(request.args.get('since', type=int)))
+
+STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', 300))
+
+@app.route('/negotiations/stream')
+def negotiations_stream():
+    # EventSource reconnects resend the last event id, which is the cursor
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+
+    def events():
+        cursor = since
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        yield "retry: 3000\n\n"
+        while True:
+            delta = negotiation_delta(cursor)
+            if delta['reset'] or delta['changes'] or delta['removed']:
+                yield f"id: {delta['cursor']}\n" + sse('changes', delta)
+            cursor = delta['cursor']
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Hand the thread back; the browser reconnects with this id as Last-Event-ID
+                yield f"id: {cursor}\n\n"
+                return
+            if not negotiation_feed.wait(cursor, timeout=min(15, remaining)):
+                yield ": keep-alive\n\n"
+    return sse_response(stream_with_context(events()))
+
 @app.route('/finalize-order/<int:id>', methods=['POST'])
 def finalize_order(id):
-    conn = get_db()
-    neg = conn.execute('SELECT * FROM negotiations WHERE id=?', (id,)).fetchone()
-    if neg:
-        send_mail(neg['supplier_email'], "PURCHASE ORDER CONFIRMED", f"Proceed with shipping {neg['units']} units.")
-        conn.execute('UPDATE inventory SET stock = stock + ? WHERE name=?', (neg['units'], neg['item_name']))
-        conn.execute('UPDATE negotiations SET status="ORDER_PLACED" WHERE id=?', (id,))
-        conn.commit()
-    conn.close()
+    with get_db() as conn:
+        neg = conn.execute('SELECT * FROM negotiations WHERE id=?', (id,)).fetchone()
+        if neg:
+            send_mail(neg['supplier_email'], "PURCHASE ORDER CONFIRMED", f"Proceed with shipping {neg['units']} units.")
+            conn.execute('UPDATE inventory SET stock = stock + ? WHERE name=?', (neg['units'], neg['item_name']))
+            record_movement(conn, neg['item_name'], neg['units'], 'receipt', ref=f"negotiation:{id}")
+            take_snapshot(conn, 'receipt', item_name=neg['item_name'])
+            conn.execute('UPDATE negotiations SET status="ORDER_PLACED" WHERE id=?', (id,))
     return redirect(url_for('inventory'))
 
+REPORTS_PER_PAGE = 20
+DATE_ARG = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
 @app.route('/reports')
 def reports():
-    if not os.path.exists(DB_NAME): init_db()
-    conn = get_db()
-    insights = conn.execute('SELECT * FROM whatsapp_insights ORDER BY timestamp DESC').fetchall()
-    
-    total_revenue_potential = sum(i['revenue'] for i in insights if i['revenue'])
-    positive_interactions = len([i for i in insights if i['sentiment'] == 'Positive'])
-    
-    conn.close()
-    return render_template('reports.html', insights=insights, total_revenue=total_revenue_potential, pos_count=positive_interactions)
+    # Newest first, one page at a time: ?before=<id> continues after that insight, ?from/?to are YYYY-MM-DD
+    date_from, date_to = request.args.get('from', ''), request.args.get('to', '')
+    before = request.args.get('before', type=int)
+    where, params = [], []
+    if DATE_ARG.match(date_from):
+        where.append('timestamp >= ?')
+        params.append(date_from)
+    if DATE_ARG.match(date_to):
+        where.append("timestamp < date(?, '+1 day')")
+        params.append(date_to)
+    if before:
+        where.append('(timestamp, id) < (SELECT timestamp, id FROM whatsapp_insights WHERE id = ?)')
+        params.append(before)
+    with get_db() as conn:
+        rows = conn.execute(f'''SELECT id, summary, sentiment, revenue, timestamp FROM whatsapp_insights
+                                {"WHERE " + " AND ".join(where) if where else ""}
+                                ORDER BY timestamp DESC, id DESC LIMIT ?''', (*params, REPORTS_PER_PAGE + 1)).fetchall()
+        insights = {r['id']: dict(r, leads=[], urgent_tasks=[]) for r in rows[:REPORTS_PER_PAGE]}
+        if insights:
+            marks = ", ".join("?" * len(insights))
+            for insight_id, lead in conn.execute(f'SELECT insight_id, lead FROM insight_leads WHERE insight_id IN ({marks}) ORDER BY id', list(insights)):
+                insights[insight_id]['leads'].append(lead)
+            for insight_id, task in conn.execute(f'SELECT insight_id, task FROM insight_tasks WHERE insight_id IN ({marks}) ORDER BY id', list(insights)):
+                insights[insight_id]['urgent_tasks'].append(task)
+        kpi = read_kpis(conn)
+    total_revenue_potential = kpi['potential_revenue']
+    positive_interactions = kpi['positive']
+
+    return render_template('reports.html', insights=list(insights.values()), total_revenue=total_revenue_potential,
+                           pos_count=positive_interactions, date_from=date_from, date_to=date_to, first_page=not before,
+                           next_before=rows[REPORTS_PER_PAGE - 1]['id'] if len(rows) > REPORTS_PER_PAGE else None)
+
+@app.route('/reports/insight/<int:id>/raw')
+def insight_raw_text(id):
+    """The original chat text of one insight, fetched only when its card is expanded."""
+    with get_db() as conn:
+        row = conn.execute('SELECT raw_text FROM whatsapp_insights WHERE id=?', (id,)).fetchone()
+    if not row:
+        return jsonify({"success": False, "error": "Insight not found"}), 404
+    return jsonify({"success": True, "raw_text": row['raw_text']})
 
 @app.route('/process-whatsapp', methods=['POST'])
 def process_whatsapp():
@@ -443,25 +829,179 @@ def process_whatsapp():
             return jsonify({"success": False, "error": "Filtered as noise by Gatekeeper"})
     return jsonify({"success": False})
 
+def parse_webhook(data, raw_body=b''):
+    """Normalizes provider payloads to [(provider_msg_id, text, source)].
+
+    Twilio posts MessageSid/Body, Meta's Cloud API nests messages under
+    entry[].changes[].value.messages[]; the simple {"message": {"id", "text"}}
+    shape is kept for manual testing. Payloads without an id are keyed on a
+    hash of the raw body, so a verbatim provider retry is still deduplicated.
+    """
+    if data.get('Body'):
+        messages = [(data.get('MessageSid') or data.get('SmsMessageSid'), data['Body'], 'twilio')]
+    else:
+        messages = []
+    for entry in data.get('entry') or []:
+        for change in entry.get('changes') or []:
+            for msg in (change.get('value') or {}).get('messages') or []:
+                text = (msg.get('text') or {}).get('body')
+                if text:
+                    messages.append((msg.get('id'), text, 'meta'))
+    message = data.get('message') or {}
+    if message.get('text'):
+        messages.append((message.get('id'), message['text'], 'manual'))
+    fallback_id = 'sha256:' + hashlib.sha256(raw_body).hexdigest()
+    return [(msg_id or f"{fallback_id}:{n}", text, source) for n, (msg_id, text, source) in enumerate(messages)]
+
+def process_ingested(rows):
+    """Ingest worker handler: one batched gatekeeper pass, then analysis per relevant message."""
+    agent = WhatsAppAgent()
+    verdicts = agent.filter_relevant([body for _, _, body, _ in rows])
+    outcomes = []
+    for (msg_id, provider_msg_id, body, _), relevant in zip(rows, verdicts):
+        if not relevant:
+            outcomes.append('ignored')
+            continue
+        analysis = agent.extract_insights(body)
+        if analysis and agent.save_insight(body, analysis):
+            outcomes.append('done')
+        else:
+            outcomes.append(f"analysis failed for {provider_msg_id}")
+    return outcomes
+
+ingest_queue = IngestQueue(get_db, max_attempts=int(os.getenv('INGEST_MAX_ATTEMPTS', 5)))
+ingest_workers = IngestWorkerPool(ingest_queue, process_ingested,
+                                  workers=int(os.getenv('INGEST_WORKERS', 2)),
+                                  batch_size=int(os.getenv('GATEKEEPER_BATCH', 20)))
+
 @app.route('/webhook/whatsapp', methods=['POST'])
 def whatsapp_webhook():
     """
     Real-time Webhook Entry Point. 
     This is where services like Twilio or Meta will send messages.
+    Messages are durably queued and acknowledged immediately; ingest workers do the LLM work.
     """
-    data = request.json
-    # Logic depends on the service provider (e.g., Twilio sends 'Body')
-    message_text = data.get('Body') or data.get('message', {}).get('text')
+    raw_body = request.get_data(cache=True) # read before .form, which would otherwise consume the stream
+    data = request.get_json(silent=True) or request.form.to_dict()
+    messages = parse_webhook(data, raw_body)
+    if not messages:
+        return jsonify({"status": "ignored"}), 200
     
-    if message_text:
-        agent = WhatsAppAgent()
-        # Processing happens autonomously
-        analysis = agent.analyze_chat(message_text)
-        if analysis:
-            agent.save_insight(message_text, analysis)
-            return jsonify({"status": "processed"}), 200
-            
-    return jsonify({"status": "ignored"}), 200
+    queued = sum(ingest_queue.enqueue(msg_id, text, source) for msg_id, text, source in messages)
+    return jsonify({"status": "queued" if queued else "duplicate", "queued": queued}), 200
+
+@app.route('/ingest/stats')
+def ingest_stats():
+    return jsonify(ingest_queue.depth())
+
+@app.route('/scheduler/stats')
+def scheduler_stats():
+    return jsonify(reply_scheduler.metrics())
+
+@app.route('/import/stats')
+def import_stats():
+    with get_db() as conn:
+        return jsonify(recent_imports(conn, min(request.args.get('limit', 20, type=int), 200)))
+
+@app.route('/stock-movements/<path:item_name>')
+def stock_movements(item_name):
+    with get_db() as conn:
+        return jsonify(item_movements(conn, item_name, min(request.args.get('limit', 100, type=int), 1000)))
+
+# The whole-inventory plan is reused for REORDER_PLAN_TTL seconds; an upload in this process drops it
+REORDER_PLAN_TTL = float(os.getenv('REORDER_PLAN_TTL', 60))
+reorder_plan_cache = {}
+
+@app.route('/reorder-plan')
+def reorder_plan():
+    """Items due for reordering, fewest days of cover first (?limit=, default 50)."""
+    with get_db() as conn:
+        planned_at, plan = reorder_plan_cache.get('plan', (0.0, None))
+        if plan is None or time.time() - planned_at > REORDER_PLAN_TTL:
+            plan = reorder_engine.plan_inventory(conn)
+            reorder_plan_cache['plan'] = (time.time(), plan)
+        rows = plan.most_urgent(min(request.args.get('limit', 50, type=int), 1000))
+        names = dict(conn.execute(f'SELECT id, name FROM inventory WHERE id IN ({", ".join("?" * len(rows))})',
+                                  [r['id'] for r in rows]).fetchall()) if rows else {}
+    for r in rows:
+        r['name'] = names.get(r['id'])
+        r['days_of_cover'] = None if r['days_of_cover'] == float('inf') else round(r['days_of_cover'], 1)
+    return jsonify({'items': len(plan), 'reorder': rows})
+
+@app.route('/llm-cache/stats')
+def llm_cache_stats():
+    return jsonify(llm_cache.stats())
+
+# --- REQUEST TIMING / PROFILING ---
+# With PROFILE_REQUESTS=1, a request sent with `X-Profile: 1` runs under cProfile and the
+# stats are dumped to PROFILE_DIR (open with `python -m pstats <file>`). One at a time.
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', '0') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+_profile_lock = threading.Lock()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_REQUESTS and request.headers.get('X-Profile') == '1' and _profile_lock.acquire(blocking=False):
+        g.profiled, g.profiler = True, cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}-{os.getpid()}-{threading.get_ident()}.prof")
+        profiler.dump_stats(path)
+        response.headers['X-Profile-Dump'] = path
+    http_seconds.observe(time.perf_counter() - g.get('request_started', time.perf_counter()),
+                         route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def release_profiler(exc):
+    if g.pop('profiled', False):
+        profiler = g.pop('profiler', None)
+        if profiler: # after_request never ran (the response failed); drop the profile
+            profiler.disable()
+        _profile_lock.release()
+
+@metrics.collector
+def queue_depths():
+    """Work waiting in every background pipeline, read at scrape time."""
+    with get_db() as conn:
+        watch = conn.execute("SELECT state, COUNT(*) FROM watch_ledger WHERE kind = 'file' GROUP BY state").fetchall()
+    scheduler = reply_scheduler.metrics()
+    return {
+        'ingest_queue_messages': {(('state', state),): n for state, n in ingest_queue.depth().items()},
+        'watcher_files': {(('state', state),): n for state, n in watch},
+        'watcher_in_flight': reports_watcher.pending(),
+        'draft_pool_pending': draft_pool.pending,
+        'reply_scheduler_scheduled': scheduler['scheduled'],
+        'reply_scheduler_overdue': scheduler['overdue'],
+        'reply_scheduler_in_flight': scheduler['in_flight'],
+        'reply_scheduler_lag_seconds': scheduler['current_lag'],
+    }
+
+@metrics.collector
+def component_stats():
+    """Running totals the subsystems already keep (counts since process start; the gatekeeper, watcher and
+    reply scheduler do their work in worker.py, which serves these on WORKER_METRICS_PORT)."""
+    cache, replies = llm_cache.stats(), dict(reply_scheduler.stats)
+    return {
+        **{f'gatekeeper_{k}': v for k, v in gatekeeper.stats.items()},
+        **{f'draft_pool_{k}': v for k, v in draft_pool.stats.items()},
+        **{f'reply_scheduler_{k}': replies[k] for k in ('processed', 'failed', 'skipped', 'lag_max')},
+        'llm_cache_entries': cache['entries'],
+        **{f'llm_cache_{k}': {(('site', site),): s[k] for site, s in cache['sites'].items()}
+           for k in ('hits', 'misses', 'bypassed', 'latency_saved')},
+    }
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/orders')
 def orders():
@@ -471,8 +1011,38 @@ def orders():
 def support():
     return render_template('support.html')
 
-if __name__ == '__main__':
+QUEUE_RETENTION_DAYS = float(os.getenv('QUEUE_RETENTION_DAYS', 30))
+
+def retention_sweeper(interval=3600.0):
+    """Background thread: drops finished ingest_queue and watch_ledger rows past QUEUE_RETENTION_DAYS, so
+    the tables (and the /metrics depth queries over them) stay bounded."""
+    while True:
+        try:
+            pruned = ingest_queue.prune(QUEUE_RETENTION_DAYS) + reports_watcher.prune(QUEUE_RETENTION_DAYS)
+            if pruned:
+                print(f"🧹 Pruned {pruned} finished queue/ledger row(s).")
+        except Exception as e:
+            print(f"Retention Sweep Error: {e}")
+        time.sleep(interval)
+
+def start_background_services():
+    """Reports watcher, stale-draft and retention sweepers, ingest workers and reply scheduler. worker.py runs
+    these in their own process; web workers never start them, so they fork fast and don't duplicate the work."""
+    threading.Thread(target=autonomous_reports_watcher, name='reports-watcher', daemon=True).start()
+    threading.Thread(target=stale_draft_sweeper, name='stale-draft-sweeper', daemon=True).start()
+    threading.Thread(target=retention_sweeper, name='retention-sweeper', daemon=True).start()
+    ingest_workers.start()
+    reply_scheduler.start()
+
+def create_app():
+    """Boots the web app once per process: schema init/migration happens here, not per request.
+    LLM clients are built on first use."""
     init_db()
-    # Start the autonomous watcher in a background thread
-    threading.Thread(target=autonomous_reports_watcher, daemon=True).start()
+    return app
+
+app = create_app() # gunicorn app:app
+
+if __name__ == '__main__':
+    # Development: everything in one process
+    start_background_services()
     app.run(debug=True, port=5000)
@@ -0,0 +1,111 @@
+"""Prompt size and latency of /ai-query: full-table dump vs the bounded FTS5 context.
+
+Seeds a throwaway database with N inventory rows and M WhatsApp insights,
+then answers a fixed set of questions both ways: the original prompt that
+pastes every row, and the retrieval context (`query_context.py`). Reports
+the prompt size in estimated tokens, the time to build it, and the
+end-to-end request time against a fake LLM whose latency grows with the
+prompt (`--prompt-latency` seconds per 1k tokens, to model prefill cost).
+
+    python benchmarks/bench_ai_query.py --items 20000 --insights 5000
+"""
+import argparse, os, random, statistics, tempfile, time
+
+import common
+
+import app as msme
+from fake_llm import FakeLLMClient
+from query_context import estimate_tokens
+
+QUESTIONS = [
+    "What is the total inventory value?",
+    "How many items are below their reorder level?",
+    "Which items should I restock first?",
+    "How much denim do we have?",
+    "Stock of cotton thread and zippers?",
+    "What are customers complaining about?",
+    "Any leads for bulk saree orders?",
+    "How many positive customer messages did we get?",
+]
+FABRICS = ['Denim', 'Cotton', 'Silk', 'Linen', 'Rayon', 'Zipper', 'Button', 'Thread', 'Saree', 'Kurta', 'Lace']
+SUMMARIES = ['Customer complained about late delivery of {}', 'Bulk order enquiry for {} from a retailer',
+             'Happy customer praised {} quality', 'Price query for {} in wholesale', 'Defective {} returned']
+
+
+def seed(items, insights):
+    msme.init_db()
+    rnd = random.Random(3)
+    with msme.get_db() as conn:
+        conn.executemany('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         ((f"{rnd.choice(FABRICS)} {rnd.choice(['Raw', 'Blue', 'Premium', 'Roll', 'Pack'])} {n}",
+                           120.0, 100.0, '10%', round(rnd.uniform(5, 500), 2), rnd.randint(0, 400), 20)
+                          for n in range(items)))
+        conn.executemany('''INSERT INTO whatsapp_insights (raw_text, processed_json, summary, sentiment, revenue)
+                            VALUES (?, ?, ?, ?, ?)''',
+                         (("...", "{}", rnd.choice(SUMMARIES).format(rnd.choice(FABRICS).lower()),
+                           rnd.choice(['Positive', 'Neutral', 'Negative']), rnd.choice([0, 0, 1500, 12000]))
+                          for _ in range(insights)))
+
+
+def legacy_context(conn):
+    """The original /ai-query context: every inventory row and every insight."""
+    items = conn.execute('SELECT name, stock, cost, min_limit FROM inventory').fetchall()
+    insights = conn.execute('SELECT summary, sentiment, revenue FROM whatsapp_insights').fetchall()
+    data_context = "Inventory:\n"
+    for i in items:
+        data_context += f"- {i['name']}: {i['stock']} units, Cost: ₹{i['cost']}\n"
+    data_context += "\nInsights:\n"
+    for ins in insights:
+        data_context += f"- {ins['summary']} (Sentiment: {ins['sentiment']}, Potential: ₹{ins['revenue']})\n"
+    return data_context
+
+
+def bounded_context(conn, question):
+    return msme.context_builder.build(conn, question, msme.read_kpis(conn))[0]
+
+
+def measure(build, fake, rounds):
+    tokens, build_ms, total_ms = [], [], []
+    with msme.get_db() as conn:
+        for _ in range(rounds):
+            for q in QUESTIONS:
+                t0 = time.perf_counter()
+                context = build(conn, q)
+                t1 = time.perf_counter()
+                fake.chat.completions.create(model="bench", messages=[{"role": "user", "content": context + q}])
+                t2 = time.perf_counter()
+                tokens.append(estimate_tokens(context))
+                build_ms.append((t1 - t0) * 1000)
+                total_ms.append((t2 - t0) * 1000)
+    return statistics.median(tokens), statistics.median(build_ms), statistics.median(total_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--insights', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake LLM seconds per call')
+    parser.add_argument('--prompt-latency', type=float, default=0.01, help='fake LLM seconds per 1k prompt tokens')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'bench.db'))
+        seed(args.items, args.insights)
+        fake = FakeLLMClient(latency=args.latency, prompt_latency=args.prompt_latency)
+        print(f"{args.items:,} items, {args.insights:,} insights, {len(QUESTIONS)} questions x {args.rounds}; "
+              f"token budget {msme.context_builder.token_budget}")
+        for label, build in (("full dump (baseline)", lambda conn, q: legacy_context(conn)),
+                             ("FTS5 bounded context", bounded_context)):
+            tokens, build_ms, total_ms = measure(build, fake, args.rounds)
+            print(f"{label:22} prompt ~{tokens:>9,.0f} tokens   build p50 {build_ms:8.2f} ms   "
+                  f"request p50 {total_ms:9.1f} ms")
+
+        with msme.get_db() as conn:
+            print("\nSample context for:", QUESTIONS[3])
+            print(bounded_context(conn, QUESTIONS[3]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Mixed reader/writer load against SQLite: per-call connections vs the pooled engine.
+
+Reader threads run the dashboard/inventory queries while writer threads
+update stock and insert insights (what uploads, the watcher and the agent
+threads do). The baseline opens a fresh `sqlite3.connect()` per operation
+in the default rollback-journal mode, like the old `get_db()`; the engine
+reuses one WAL-mode connection per thread. Reports ops/sec, per-op p50/p99
+and how many operations failed with "database is locked".
+
+    python benchmarks/bench_db_concurrency.py --readers 8 --writers 4 --seconds 5
+"""
+import argparse, os, random, sqlite3, tempfile, threading, time
+from contextlib import contextmanager
+
+import common
+
+import app as msme
+from db_engine import DBEngine
+
+
+def seed(path, rows):
+    msme.db.configure(path)
+    msme.init_db()
+    rnd = random.Random(9)
+    with msme.get_db() as conn:
+        conn.executemany("INSERT INTO inventory (name, mrp, sp, cost, stock, min_limit) VALUES (?, ?, ?, ?, ?, ?)",
+                         [(f"Item {i}", 1500, rnd.randint(900, 1400), rnd.randint(10, 800), rnd.randint(0, 500),
+                           rnd.randint(10, 100)) for i in range(rows)])
+    msme.db.close_all()
+
+
+def legacy_connect(path, timeout):
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(path, timeout=timeout) # what get_db() used to do for every call
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    return connect
+
+
+def read_op(conn, rnd, rows):
+    if rnd.random() < 0.5:
+        conn.execute("SELECT * FROM kpi_summary WHERE id = 1").fetchone()
+        conn.execute("SELECT name, stock * cost AS value FROM inventory ORDER BY stock * cost DESC LIMIT 5").fetchall()
+    else:
+        conn.execute("SELECT * FROM inventory ORDER BY id LIMIT 10 OFFSET ?", (rnd.randrange(rows),)).fetchall()
+
+
+def write_op(conn, rnd, rows):
+    if rnd.random() < 0.7:
+        conn.execute("UPDATE inventory SET stock = ? WHERE id = ?", (rnd.randint(0, 500), rnd.randint(1, rows)))
+    else:
+        conn.execute("INSERT INTO whatsapp_insights (raw_text, processed_json, summary, sentiment, revenue) "
+                     "VALUES (?, ?, ?, ?, ?)", ("bench message", '{"sentiment": "Neutral"}', "bench", 'Neutral', 0))
+
+
+def run(connect, args, label):
+    stop = threading.Event()
+    latencies, locked, lock = {'read': [], 'write': []}, {'read': 0, 'write': 0}, threading.Lock()
+
+    def worker(kind, seed_):
+        rnd, op, samples, errors = random.Random(seed_), read_op if kind == 'read' else write_op, [], 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with connect() as conn:
+                    op(conn, rnd, args.rows)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - started)
+        with lock:
+            latencies[kind].extend(samples)
+            locked[kind] += errors
+
+    threads = [threading.Thread(target=worker, args=('read', n)) for n in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=('write', 100 + n)) for n in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print(f"\n{label}")
+    for kind in ('read', 'write'):
+        samples = sorted(latencies[kind])
+        if not samples:
+            print(f"  {kind:5}: no successful operations, {locked[kind]} locked")
+            continue
+        p50, p99 = samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f"  {kind:5}: {len(samples) / args.seconds:9,.0f} ops/s  p50 {p50 * 1000:7.2f} ms  "
+              f"p99 {p99 * 1000:8.2f} ms  locked errors {locked[kind]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--legacy-timeout', type=float, default=5.0,
+                        help='sqlite3.connect timeout for the baseline (5s is the sqlite3 default)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path, engine_path = os.path.join(tmp, 'legacy.db'), os.path.join(tmp, 'engine.db')
+        seed(engine_path, args.rows)
+        seed(legacy_path, args.rows)
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE") # the old databases were never switched to WAL
+
+        print(f"{args.readers} readers + {args.writers} writers for {args.seconds:.0f}s over {args.rows:,} items")
+        run(legacy_connect(legacy_path, args.legacy_timeout), args,
+            "per-call sqlite3.connect, rollback journal (baseline)")
+
+        engine = DBEngine(engine_path)
+        run(engine.connect, args, "DBEngine: pooled per-thread connections, WAL")
+        engine.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Draft generation benchmark for /upload-all with a fake, slow LLM.
+
+Uploads an inventory where every item is below its threshold, then reports
+how long the upload request took and how long until every DRAFT_PENDING
+negotiation had its draft, for sequential generation (the original loop)
+and for the worker pool at several concurrency limits.
+
+    python benchmarks/bench_drafts.py --items 200 --latency 0.2
+"""
+import argparse, io, os, tempfile, time
+
+import common
+
+import app as msme
+from draft_worker import DraftWorkerPool
+from fake_llm import FakeLLMClient
+from llm_provider import LLMProvider
+
+
+def csv_files(items):
+    inv = "Item Name,MRP,Selling Price,Discount,Cost Price,Stock,Min Limit\n" + "".join(
+        f"Item {n},100,90,10%,60,{n % 5},10\n" for n in range(items))
+    sup = "item,supplier_name,supplier_email\n" + "".join(
+        f"Item {n},Supplier {n % 7},s{n % 7}@example.com\n" for n in range(items))
+    return {'inventory': (io.BytesIO(inv.encode()), 'inv.csv'), 'suppliers': (io.BytesIO(sup.encode()), 'sup.csv')}
+
+
+def sequential_baseline(llm, items):
+    agent = msme.SmartNegotiationAgent(LLMProvider(llm))
+    t0 = time.perf_counter()
+    for n in range(items):
+        agent.draft_email(f"Item {n}", n % 5, 10, f"Supplier {n % 7}")
+    return time.perf_counter() - t0
+
+
+def run_pool(tmp, items, workers, latency, rate_limit_every):
+    msme.db.configure(os.path.join(tmp, f'drafts-{workers}.db'))
+    msme.init_db()
+    llm = FakeLLMClient(latency=latency, rate_limit_every=rate_limit_every, retry_after=0.05, seed=1)
+    msme.draft_pool = DraftWorkerPool(msme.SmartNegotiationAgent(LLMProvider(llm)), msme.save_negotiation_draft,
+                                      max_workers=workers, base_delay=0.05)
+    client = msme.app.test_client()
+    t0 = time.perf_counter()
+    resp = client.post('/upload-all', data=csv_files(items))
+    upload = time.perf_counter() - t0
+    assert resp.status_code == 302
+    msme.draft_pool.wait()
+    done = time.perf_counter() - t0
+    conn = msme.db.connection()
+    pending = conn.execute('SELECT COUNT(*) FROM negotiations WHERE status = "DRAFT_PENDING"').fetchone()[0]
+    msme.draft_pool.shutdown()
+    return upload, done, pending, llm.max_in_flight, msme.draft_pool.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake LLM seconds per call')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 16, 32])
+    parser.add_argument('--rate-limit-every', type=int, default=25, help='every Nth call returns HTTP 429')
+    args = parser.parse_args()
+
+    seq = sequential_baseline(FakeLLMClient(latency=args.latency), args.items)
+    print(f"sequential: upload blocked for {seq:.2f}s ({args.items} drafts x {args.latency}s)")
+    print(f"{'workers':>7} {'upload s':>9} {'drafted s':>10} {'left':>5} {'in-flight':>9} {'429s':>5} {'fallbacks':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            upload, done, pending, in_flight, stats = run_pool(tmp, args.items, workers, args.latency,
+                                                               args.rate_limit_every)
+            print(f"{workers:>7} {upload:>9.3f} {done:>10.2f} {pending:>5} {in_flight:>9} "
+                  f"{stats['rate_limited']:>5} {stats['fallbacks']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""End-to-end load run of the whole app against the deterministic fake LLM.
+
+Drives the app in-process with LLM_BACKEND=fake, so runs are offline and
+repeatable: uploads an N-item inventory (and waits for the reorder drafts),
+fires a burst of WhatsApp webhooks from concurrent clients and waits for the
+ingest workers to drain them, hammers the read pages (dashboard, inventory,
+reports, reorder plan) concurrently, then asks a round of /ai-query
+questions. Prints throughput and p50/p95/p99 latency per phase.
+
+`--output` writes the same numbers as JSON together with the git revision,
+so results can be kept per version; `--baseline` compares against such a
+file.
+
+    python benchmarks/bench_e2e.py --items 5000 --webhooks 2000 --reads 2000 --output e2e.json
+    python benchmarks/bench_e2e.py --baseline e2e.json
+"""
+import argparse, contextlib, io, json, os, random, subprocess, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT
+os.environ["LLM_BACKEND"] = "fake"
+
+TEXTS = ["Good morning", "Need 200 pcs zippers urgently, what's the rate?", "Is Ramesh coming to the shop today?",
+         "Payment of ₹12,000 sent, share invoice", "👍", "Delivery was late again, customer is angry",
+         "Send quotation for 50 metres cotton blue by Monday"]
+QUESTIONS = ["Which items are low on stock?", "What is the total inventory value?", "Which denim items should I restock?",
+             "Summarise the angry customers", "What are the urgent tasks?"]
+
+
+def csv_files(items, seed=11):
+    rnd = random.Random(seed)
+    inv = "item,mrp,sp,discount,cost,stock,min_limit\n" + "".join(
+        f"Fabric {n:06d},{(c := rnd.randint(50, 900)) * 1.5},{c * 1.3},13%,{c},{rnd.randint(0, 200)},20\n"
+        for n in range(items))
+    sup = "item,supplier_name,supplier_email\n" + "".join(
+        f"Fabric {n:06d},Mill {n % 40},mill{n % 40}@example.com\n" for n in range(items))
+    return {'inventory': (io.BytesIO(inv.encode()), 'inv.csv'), 'suppliers': (io.BytesIO(sup.encode()), 'sup.csv')}
+
+
+def summary(samples, seconds, errors=0):
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2) if samples else None
+    return {'ops': len(samples), 'seconds': round(seconds, 3),
+            'throughput': round(len(samples) / seconds, 1) if seconds else None,
+            'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'errors': errors}
+
+
+def concurrent(app, requests, concurrency):
+    """Runs (method, path, kwargs) requests from `concurrency` test clients; returns the phase summary."""
+    local = threading.local()
+
+    def one(req):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        method, path, kwargs = req
+        t0 = time.perf_counter()
+        status = local.client.open(path, method=method, **kwargs).status_code
+        return time.perf_counter() - t0, status >= 400
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, requests))
+    return summary([s for s, _ in results], time.perf_counter() - t0, sum(bad for _, bad in results))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(msme, args, tmp):
+    msme.db.configure(os.path.join(tmp, 'e2e.db'))
+    msme.init_db()
+    client = msme.app.test_client()
+    phases = {}
+
+    t0 = time.perf_counter()
+    resp = client.post('/upload-all', data=csv_files(args.items))
+    upload = time.perf_counter() - t0
+    msme.draft_pool.wait(args.timeout)
+    with msme.get_db() as conn:
+        drafts = conn.execute('SELECT COUNT(*) FROM negotiations').fetchone()[0]
+    phases['upload'] = summary([upload], upload, int(resp.status_code >= 400))
+    phases['drafts'] = {**summary([], time.perf_counter() - t0), 'ops': drafts,
+                        'throughput': round(drafts / (time.perf_counter() - t0), 1)}
+
+    rnd = random.Random(7)
+    bodies = [{'MessageSid': f"SM{k:08d}", 'Body': rnd.choice(TEXTS), 'From': 'whatsapp:+910000000000'}
+              for k in range(args.webhooks)]
+    phases['webhook_ack'] = concurrent(msme.app, [('POST', '/webhook/whatsapp', {'data': b}) for b in bodies],
+                                       args.concurrency)
+    t0 = time.perf_counter()
+    msme.ingest_workers.start()
+    deadline = t0 + args.timeout
+    while time.perf_counter() < deadline:
+        depth = msme.ingest_queue.depth()
+        if not depth.get('pending') and not depth.get('processing'):
+            break
+        time.sleep(0.05)
+    msme.ingest_workers.stop()
+    depth = msme.ingest_queue.depth()
+    phases['ingest_drain'] = {**summary([], time.perf_counter() - t0, depth.get('dead', 0) + depth.get('pending', 0)),
+                              'ops': args.webhooks,
+                              'throughput': round(args.webhooks / (time.perf_counter() - t0), 1)}
+
+    pages = max(args.items // 10, 1)
+    reads = [('GET', rnd.choice(['/', f'/inventory?page={rnd.randint(1, pages)}', '/reports', '/reorder-plan?limit=50']), {})
+             for _ in range(args.reads)]
+    phases['reads'] = concurrent(msme.app, reads, args.concurrency)
+
+    questions = [('POST', '/ai-query', {'json': {'query': f"{QUESTIONS[k % len(QUESTIONS)]} ({k})"}})
+                 for k in range(args.queries)]
+    phases['ai_query'] = concurrent(msme.app, questions, min(args.concurrency, 4))
+    return phases
+
+
+def compare(phases, baseline):
+    print(f"\nvs {baseline['revision']} ({baseline['timestamp']}):")
+    for name, stats in phases.items():
+        old = baseline['phases'].get(name)
+        if not old:
+            continue
+        deltas = [f"{key} {old[key]} -> {stats[key]} ({(stats[key] - old[key]) / old[key]:+.0%})"
+                  for key in ('throughput', 'p95_ms') if stats.get(key) and old.get(key)]
+        print(f"  {name:<13} " + ', '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--webhooks', type=int, default=2000)
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help='fake LLM seconds per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of fake LLM calls that fail')
+    parser.add_argument('--timeout', type=float, default=600.0, help='max seconds to wait for drafts / queue drain')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON file from an earlier --output run to compare against')
+    args = parser.parse_args()
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ.setdefault("FAKE_LLM_SEED", "1")
+
+    import app as msme
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        phases = run(msme, args, tmp)
+
+    print(f"{args.items:,} items, {args.webhooks:,} webhooks, {args.reads:,} reads, {args.queries} AI queries; "
+          f"fake LLM {args.latency * 1000:.0f} ms, {args.error_rate:.0%} errors, concurrency {args.concurrency}")
+    print(f"  {'phase':<13} {'ops':>7} {'seconds':>8} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for name, s in phases.items():
+        row = [s['ops'], s['seconds'], s['throughput'], s['p50_ms'], s['p95_ms'], s['p99_ms'], s['errors']]
+        print(f"  {name:<13} " + ' '.join(f"{'-' if v is None else v:>{w}}" for v, w in zip(row, (7, 8, 9, 8, 8, 8, 6))))
+
+    report = {'revision': git_revision(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}, 'phases': phases}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(phases, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
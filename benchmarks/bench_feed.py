@@ -0,0 +1,76 @@
+"""Cost of keeping the inventory negotiation modal current: full-page polling vs the change feed.
+
+Seeds N inventory rows and M open negotiations, then measures what one
+operator's refresh costs the server: the old 5-second poll (GET /inventory,
+full render), a feed request with nothing new, and a feed request after one
+negotiation changed status. Reports p50 latency and response bytes.
+
+    python benchmarks/bench_feed.py --rows 100000 --negotiations 500
+"""
+import argparse, os, random, statistics, tempfile, time
+
+import common
+
+import app as msme
+
+
+def seed(rows, negotiations):
+    msme.init_db()
+    rnd = random.Random(11)
+    with msme.get_db() as conn:
+        conn.executemany('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         ((f"SKU-{n:07d}", 120.0, 100.0, '10%', rnd.uniform(5, 500), rnd.randint(0, 400), 10)
+                          for n in range(rows)))
+        conn.executemany('''INSERT INTO negotiations (item_name, supplier_email, draft, invoice_amount, status)
+                            VALUES (?, ?, ?, ?, 'AWAITING_HUMAN')''',
+                         ((f"SKU-{n:07d}", f"s{n}@example.com", "Subject: Restock\n\n" + "Please quote. " * 40, 5000.0)
+                          for n in range(negotiations)))
+
+
+def measure(client, path, n, before=None):
+    samples, size = [], 0
+    for k in range(n):
+        if before:
+            before(k)
+        t0 = time.perf_counter()
+        resp = client.get(path() if callable(path) else path)
+        samples.append((time.perf_counter() - t0) * 1000)
+        size = len(resp.data)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--negotiations', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'feed.db'))
+        seed(args.rows, args.negotiations)
+        client = msme.app.test_client()
+        with msme.get_db() as conn:
+            cursor = [msme.current_cursor(conn)]
+
+        def touch(k):
+            with msme.get_db() as conn:
+                conn.execute("UPDATE negotiations SET status = 'INQUIRY_SENT' WHERE id = ?", (k + 1,))
+
+        def feed_path():
+            path = f"/negotiations/feed?since={cursor[0]}"
+            with msme.get_db() as conn:
+                cursor[0] = msme.current_cursor(conn)
+            return path
+
+        print(f"{args.rows:,} items, {args.negotiations:,} open negotiations, {args.requests} requests each")
+        for label, path, before in (("poll GET /inventory (old)", "/inventory", None),
+                                    ("feed, no changes", lambda: f"/negotiations/feed?since={cursor[0]}", None),
+                                    ("feed, 1 status change", feed_path, touch)):
+            p50, size = measure(client, path, args.requests, before)
+            print(f"{label:28} p50 {p50:8.2f} ms   {size:>10,} bytes")
+
+
+if __name__ == '__main__':
+    main()
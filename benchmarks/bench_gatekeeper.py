@@ -0,0 +1,97 @@
+"""Gatekeeper benchmark: LLM calls and seconds spent deciding relevance.
+
+Replays a WhatsApp message corpus (one message per line, or a generated mix
+of greetings, chatter and business messages) through:
+  * legacy     — one LLM round-trip per message (the old is_business_relevant)
+  * batched    — local pre-filter + classify_many() batches
+  * concurrent — 16 threads calling classify() one message at a time, as
+                 webhook requests would, coalesced by the micro-batcher
+
+    python benchmarks/bench_gatekeeper.py --messages 1000 --latency 0.1
+"""
+import argparse, random, time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+
+from fake_llm import FakeLLMClient
+from gatekeeper import BatchGatekeeper, prefilter
+from llm_provider import LLMProvider
+
+NOISE = ["Good morning", "Hi", "ok", "👍", "Thanks bhai", "Good night all", "haha", "<Media omitted>",
+         "See you tomorrow", "Happy Sunday everyone!", "This message was deleted", "lol true"]
+BUSINESS = ["What is the rate for 50 metres of denim raw?", "Delivery was late again, customer is angry",
+            "Need 200 pcs zippers urgently, can you dispatch today?", "Payment of ₹12,000 sent, please share invoice",
+            "The silk thread colour is wrong, we want a replacement", "Do you have cotton blue in stock?"]
+UNSURE = ["Is Ramesh coming to the shop today?", "Call me when free", "My cousin wants to meet you next week",
+          "Can you check the last thing I sent?", "Is the new shop open on Sunday?"]
+
+# Short feedback carries no business keyword but must still reach the LLM
+SHORT_FEEDBACK = ["Worst experience ever", "Loved the fabric", "Kapda bekar hai"]
+
+
+def check_prefilter():
+    for text in NOISE + ["", "🙏🙏", "..."]:
+        assert prefilter(text) is False, text
+    for text in SHORT_FEEDBACK + UNSURE:
+        assert prefilter(text) is None, text
+    for text in BUSINESS:
+        assert prefilter(text) is not False, text
+
+
+def corpus(n, path=None):
+    if path:
+        with open(path, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    rnd = random.Random(3)
+    pools = [NOISE] * 6 + [BUSINESS] * 3 + [UNSURE] # ~60% noise, like a typical group chat
+    return [rnd.choice(rnd.choice(pools)) for _ in range(n)]
+
+
+def legacy(messages, latency):
+    llm = FakeLLMClient(latency=latency)
+    t0 = time.perf_counter()
+    for text in messages:
+        llm.chat.completions.create(model="llama-3.3-70b-versatile",
+                                    messages=[{"role": "user", "content": f'Message: "{text}" Answer (YES/NO):'}],
+                                    max_tokens=5)
+    return llm.calls, time.perf_counter() - t0
+
+
+def batched(messages, latency, batch):
+    gk = BatchGatekeeper(LLMProvider(FakeLLMClient(latency=latency)), max_batch=batch)
+    t0 = time.perf_counter()
+    gk.classify_many(messages)
+    return gk.stats, time.perf_counter() - t0
+
+
+def concurrent(messages, latency, batch):
+    gk = BatchGatekeeper(LLMProvider(FakeLLMClient(latency=latency)), max_batch=batch)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(gk.classify, messages))
+    return gk.stats, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--corpus', help='replay this file (one message per line) instead of a generated corpus')
+    parser.add_argument('--latency', type=float, default=0.1, help='fake LLM seconds per call')
+    parser.add_argument('--batch', type=int, default=20)
+    args = parser.parse_args()
+
+    check_prefilter()
+    messages = corpus(args.messages, args.corpus)
+    calls, secs = legacy(messages, args.latency)
+    print(f"{len(messages)} messages, {args.latency}s per LLM call")
+    print(f"{'mode':<11} {'LLM calls':>9} {'wall s':>8} {'noise':>6} {'business':>8} {'to LLM':>7}")
+    print(f"{'legacy':<11} {calls:>9} {secs:>8.2f} {'-':>6} {'-':>8} {len(messages):>7}")
+    for label, run in (("batched", batched), ("concurrent", concurrent)):
+        stats, secs = run(messages, args.latency, args.batch)
+        print(f"{label:<11} {stats['llm_calls']:>9} {secs:>8.2f} {stats['prefiltered_noise']:>6} "
+              f"{stats['prefiltered_business']:>8} {stats['llm_messages']:>7}")
+
+
+if __name__ == '__main__':
+    main()
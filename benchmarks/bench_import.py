@@ -0,0 +1,78 @@
+"""Throughput benchmark for the inventory CSV import (rows/sec).
+
+Generates a file shaped like Sample_csv/stocks.csv (with a sprinkling of
+malformed rows) and loads it with the original DictReader + per-row INSERT
+loop and with the streaming csv_importer.
+
+    python benchmarks/bench_import.py --rows 500000
+"""
+import argparse, csv, os, random, tempfile, time
+
+import common
+
+import app as msme
+from csv_importer import import_inventory
+
+
+def generate(path, rows, bad_every=1000):
+    rnd = random.Random(7)
+    with open(path, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['Item Name', 'MRP', 'Selling Price', 'Discount', 'Cost Price', 'Stock'])
+        for n in range(rows):
+            cost = round(rnd.uniform(5, 500), 2)
+            stock = 'n/a' if bad_every and n % bad_every == bad_every - 1 else rnd.randint(0, 400)
+            w.writerow([f"Fabric Roll {n:07d}", round(cost * 1.5, 2), round(cost * 1.3, 2), '13%', cost, stock])
+
+
+def legacy_import(conn, path):
+    """The pre-streaming loop from upload_all (skips rows that fail to parse)."""
+    inserted = 0
+    with open(path, 'r') as f:
+        for row in csv.DictReader(f):
+            try:
+                name = row.get('item') or row.get('name') or row.get('Item Name')
+                cost = float(row.get('price') or row.get('cost') or row.get('Cost Price') or 0)
+                mrp = float(row.get('mrp') or row.get('MRP') or 0)
+                sp = float(row.get('sp') or row.get('Selling Price') or 0)
+                stock = int(row.get('stock') or row.get('Stock') or 0)
+                min_limit = int(row.get('min_limit') or row.get('Threshold') or row.get('Min Limit') or 10)
+                discount = row.get('discount') or row.get('Discount') or '0%'
+            except ValueError:
+                continue
+            if name:
+                conn.execute('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)''', (name, mrp, sp, discount, cost, stock, min_limit))
+                inserted += 1
+    return inserted
+
+
+def streaming_import(conn, path):
+    with open(path, 'rb') as f:
+        report = import_inventory(conn, f)
+    return report.inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'stocks.csv')
+        generate(csv_path, args.rows)
+        print(f"Generated {args.rows:,} rows ({os.path.getsize(csv_path) / 2**20:.1f} MiB)")
+        print(f"{'impl':<10} {'inserted':>10} {'seconds':>9} {'rows/s':>11}")
+        for label, loader in (("legacy", legacy_import), ("streaming", streaming_import)):
+            msme.db.configure(os.path.join(tmp, f'{label}.db'))
+            msme.init_db()
+            conn = msme.db.connection()
+            t0 = time.perf_counter()
+            inserted = loader(conn, csv_path)
+            conn.commit()
+            elapsed = time.perf_counter() - t0
+            print(f"{label:<10} {inserted:>10,} {elapsed:>9.2f} {inserted / elapsed:>11,.0f}")
+
+
+if __name__ == '__main__':
+    main()
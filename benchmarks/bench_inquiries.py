@@ -0,0 +1,101 @@
+"""Bulk "send all inquiries": thread-per-inquiry vs the reply scheduler.
+
+Seeds N negotiations awaiting approval and sends them all. The baseline is
+the original behaviour — one thread per inquiry that sleeps, looks the
+negotiation up by item name and calls the (fake) LLM; the new path is
+/send-inquiries with the timer-heap scheduler and a fixed worker pool.
+Reports peak thread count, time until every reply is recorded, and the
+scheduler's lag behind each reply's due time.
+
+    python benchmarks/bench_inquiries.py --negotiations 1000 --delay 1 --latency 0.05
+"""
+import argparse, contextlib, io, os, tempfile, threading, time
+
+import common
+
+import app as msme
+from fake_llm import FakeLLMClient
+from llm_provider import LLMProvider
+
+
+def seed(path, n):
+    msme.db.configure(path)
+    msme.init_db()
+    with msme.get_db() as conn:
+        conn.executemany('''INSERT INTO negotiations (item_name, supplier_email, draft, invoice_amount, status, units)
+                            VALUES (?, ?, 'draft', ?, 'AWAITING_HUMAN', 500)''',
+                         [(f"SKU-{k % (n // 2 or 1)}", f"s{k}@example.com", 100.0 * k) for k in range(n)]) # items repeat
+
+
+def legacy_read(item_name, delay):
+    """The original simulate_agent_read: sleeps, then looks the negotiation up by item name."""
+    time.sleep(delay)
+    with msme.get_db() as conn:
+        neg = conn.execute('SELECT * FROM negotiations WHERE item_name=? AND status="INQUIRY_SENT"', (item_name,)).fetchone()
+    if neg:
+        analysis = msme.simulate_agent_read(neg)
+        with msme.get_db() as conn:
+            conn.execute('UPDATE negotiations SET status="INVOICE_RECEIVED", last_reply=? WHERE id=?', (analysis, neg['id']))
+
+
+def remaining():
+    with msme.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM negotiations WHERE status = 'INQUIRY_SENT'").fetchone()[0]
+
+
+def wait_until_done(timeout, peak):
+    started = time.perf_counter()
+    while remaining() and time.perf_counter() - started < timeout:
+        peak[0] = max(peak[0], threading.active_count())
+        time.sleep(0.05)
+    return remaining()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--negotiations', type=int, default=1000)
+    parser.add_argument('--delay', type=float, default=1.0, help='seconds until a supplier "replies"')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake LLM seconds per call')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+    msme.llm = LLMProvider(FakeLLMClient(latency=args.latency))
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()) as quiet:
+        seed(os.path.join(tmp, 'legacy.db'), args.negotiations)
+        peak = [threading.active_count()]
+        t0 = time.perf_counter()
+        with msme.get_db() as conn:
+            negs = conn.execute('SELECT id, item_name FROM negotiations').fetchall()
+            conn.execute('UPDATE negotiations SET status="INQUIRY_SENT"')
+        for neg in negs:
+            threading.Thread(target=legacy_read, args=(neg['item_name'], args.delay)).start()
+        stuck = wait_until_done(args.timeout, peak)
+        legacy = (peak[0], time.perf_counter() - t0, stuck)
+        while threading.active_count() > 2:
+            time.sleep(0.05)
+
+        seed(os.path.join(tmp, 'scheduler.db'), args.negotiations)
+        msme.SUPPLIER_REPLY_DELAY = args.delay
+        msme.reply_scheduler = scheduler = msme.ReplyScheduler(msme.get_db, msme.simulate_agent_read,
+                                                               workers=args.workers).start()
+        peak = [threading.active_count()]
+        t0 = time.perf_counter()
+        sent = msme.app.test_client().post('/send-inquiries', json={}).get_json()['sent']
+        stuck = wait_until_done(args.timeout, peak)
+        new = (peak[0], time.perf_counter() - t0, stuck)
+        metrics = scheduler.metrics()
+        scheduler.stop()
+
+    print(f"{args.negotiations:,} inquiries, reply after {args.delay}s, fake LLM {args.latency * 1000:.0f} ms")
+    print(f"{'impl':22} {'peak threads':>12} {'all replies':>12} {'unanswered':>11}")
+    print(f"{'thread per inquiry':22} {legacy[0]:12,} {legacy[1]:11.2f}s {legacy[2]:11,}")
+    print(f"{'scheduler':22} {new[0]:12,} {new[1]:11.2f}s {new[2]:11,}")
+    print(f"\nscheduler: sent {sent}, processed {metrics['processed']}, lag avg {metrics['lag_avg'] * 1000:.0f} ms, "
+          f"max {metrics['lag_max'] * 1000:.0f} ms ({args.workers} workers)")
+    if legacy[2]:
+        print(f"thread-per-inquiry left {legacy[2]} negotiations unanswered: lookups by item name raced on duplicates")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""LLM response cache benchmark: replays the same calls twice through the cache.
+
+Drafts restock emails for N items and runs the WhatsApp analysis for a
+handful of messages against a fake LLM with fixed latency, then repeats the
+exact same workload (a re-uploaded CSV / re-posted message) and prints the
+cache counters.
+
+    python benchmarks/bench_llm_cache.py --items 50 --latency 0.05
+"""
+import argparse, json, os, tempfile, time
+
+import common
+
+import app as msme
+from fake_llm import FakeLLMClient
+from llm_cache import LLMCache, CachedLLMClient
+from llm_provider import LLMProvider
+
+MESSAGES = [
+    "Need 40 metres of denim raw by Friday, what's your best price?",
+    "The cotton blue fabric we got last week was torn, please replace.",
+    "Can you send the catalogue for silk threads? Ordering for 3 shops.",
+]
+
+
+def workload(items):
+    agent = msme.SmartNegotiationAgent()
+    for n in range(items):
+        agent.draft_email(f"Item {n}", n % 5, 10, f"Supplier {n % 7}")
+    wa = msme.WhatsAppAgent()
+    for text in MESSAGES:
+        wa.analyze_chat(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = FakeLLMClient(latency=args.latency)
+        cache = LLMCache(os.path.join(tmp, 'cache.db'))
+        msme.llm = LLMProvider(CachedLLMClient(fake, cache))
+        for label in ("cold", "warm"):
+            calls, t0 = fake.calls, time.perf_counter()
+            workload(args.items)
+            print(f"{label}: {time.perf_counter() - t0:.2f}s, {fake.calls - calls} LLM calls")
+        print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
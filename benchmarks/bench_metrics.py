@@ -0,0 +1,62 @@
+"""Overhead of the metrics instrumentation, and the cost of a /metrics scrape.
+
+Times a batch of small SQLite statements with and without the per-statement
+timer, a hot GET /inventory with the request hooks as shipped, and the
+/metrics endpoint itself once the histograms are populated.
+
+    python benchmarks/bench_metrics.py --statements 200000 --requests 300
+"""
+import argparse, os, statistics, tempfile, time
+
+import common
+
+import app as msme
+
+
+def statements(n):
+    with msme.get_db() as conn:
+        t0 = time.perf_counter()
+        for k in range(n):
+            conn.execute('SELECT stock FROM inventory WHERE id = ?', (k % 1000 + 1,)).fetchone()
+        return (time.perf_counter() - t0) / n * 1e6
+
+
+def requests(client, path, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        client.get(path)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--statements', type=int, default=200_000)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'metrics.db'))
+        msme.init_db()
+        with msme.get_db() as conn:
+            conn.executemany("INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit) VALUES (?, 1, 1, '', 1, ?, 10)",
+                             ((f"SKU-{k}", k % 50) for k in range(1000)))
+        on_query = msme.db.on_query
+        msme.db.on_query = None
+        msme.db.configure()
+        bare = statements(args.statements)
+        msme.db.on_query = on_query
+        msme.db.configure()
+        timed = statements(args.statements)
+        print(f"SQLite point query       {bare:6.2f} µs bare, {timed:6.2f} µs timed (+{timed - bare:.2f} µs)")
+
+        client = msme.app.test_client()
+        print(f"GET /inventory p50       {requests(client, '/inventory', args.requests):6.2f} ms (hooks + statement timing)")
+        scrape = requests(client, '/metrics', 50)
+        size = len(client.get('/metrics').data)
+        print(f"GET /metrics p50         {scrape:6.2f} ms, {size:,} bytes")
+
+
+if __name__ == '__main__':
+    main()
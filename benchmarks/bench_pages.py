@@ -0,0 +1,101 @@
+"""Page latency benchmark for the dashboard (/) and inventory (/inventory) views.
+
+Seeds a throwaway database with N inventory rows and compares the original
+full-table-scan implementation (fetch every row, aggregate in Python) against
+the current SQL-aggregate + LIMIT/OFFSET views.
+
+    python benchmarks/bench_pages.py --rows 100000 --requests 200
+"""
+import argparse, os, random, statistics, tempfile, time
+
+import common
+
+import app as msme
+from flask import render_template, request
+
+
+def seed(rows):
+    msme.init_db()
+    conn = msme.db.connection()
+    rnd = random.Random(42)
+    conn.executemany('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     ((f"SKU-{n:07d}", 120.0, 100.0, '10%', rnd.uniform(5, 500), rnd.randint(0, 400), 10)
+                      for n in range(rows)))
+    conn.commit()
+
+
+# --- Baseline implementations (pre-aggregation), kept here for comparison only ---
+def legacy_dashboard():
+    conn = msme.db.connection()
+    all_items = conn.execute('SELECT * FROM inventory').fetchall()
+    total_val = sum(item['stock'] * item['cost'] for item in all_items)
+    low_stock = len([i for i in all_items if i['stock'] < i['min_limit']])
+    insights = conn.execute('SELECT * FROM whatsapp_insights').fetchall()
+    pot_rev = sum(i['revenue'] for i in insights if i['revenue'])
+    sorted_items = sorted(all_items, key=lambda x: x['stock'] * x['cost'], reverse=True)[:5]
+    sentiment = [len([i for i in insights if i['sentiment'] == s]) for s in ('Positive', 'Neutral', 'Negative')]
+    return render_template('dashboard.html', total_val=f"₹{total_val:,.2f}", low_stock=low_stock,
+                           pot_rev=f"₹{pot_rev:,.2f}", total_items=len(all_items),
+                           chart_labels=[i['name'] for i in sorted_items],
+                           chart_stock=[i['stock'] for i in sorted_items],
+                           chart_value=[i['stock'] * i['cost'] for i in sorted_items],
+                           sentiment_data=sentiment)
+
+
+def legacy_inventory():
+    conn = msme.db.connection()
+    all_items = conn.execute('SELECT * FROM inventory').fetchall()
+    total_value = sum(item['stock'] * item['cost'] for item in all_items)
+    low = len([item for item in all_items if item['stock'] < item['min_limit']])
+    page = request.args.get('page', 1, type=int)
+    start = (page - 1) * 10
+    negs = conn.execute('SELECT * FROM negotiations WHERE status != "ORDER_PLACED"').fetchall()
+    return render_template('inventory.html', items=all_items[start:start + 10], negotiations=negs, page=page,
+                           total_pages=(len(all_items) + 9) // 10 or 1, total_value=f"₹{total_value:,.2f}",
+                           ordered=0, low_stock=low)
+
+
+def measure(client, paths, n):
+    samples = []
+    for k in range(n):
+        path = paths[k % len(paths)]
+        t0 = time.perf_counter()
+        resp = client.get(path)
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert resp.status_code == 200, (path, resp.status_code)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'bench.db'))
+        t0 = time.perf_counter()
+        seed(args.rows)
+        print(f"Seeded {args.rows:,} rows in {time.perf_counter() - t0:.1f}s")
+
+        msme.app.add_url_rule('/_legacy/', 'legacy_dashboard', legacy_dashboard)
+        msme.app.add_url_rule('/_legacy/inventory', 'legacy_inventory', legacy_inventory)
+        client = msme.app.test_client()
+        last_page = (args.rows + 9) // 10
+        inv_pages = [f"?page={p}" for p in (1, 2, last_page // 2, last_page)]
+
+        cases = [
+            ("dashboard", ['/_legacy/'], ['/']),
+            ("inventory", [f"/_legacy/inventory{q}" for q in inv_pages], [f"/inventory{q}" for q in inv_pages]),
+        ]
+        print(f"{'view':<10} {'impl':<7} {'p50 ms':>9} {'p99 ms':>9}")
+        for name, before, after in cases:
+            for label, paths in (("before", before), ("after", after)):
+                p50, p99 = measure(client, paths, args.requests)
+                print(f"{name:<10} {label:<7} {p50:>9.2f} {p99:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
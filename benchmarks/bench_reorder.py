@@ -0,0 +1,136 @@
+"""Reorder engine throughput: vectorized plan over the whole inventory vs a per-row loop.
+
+Generates N SKUs with S stock snapshots each (random daily consumption,
+occasional receipts) and times `demand_stats` + `ReorderEngine.plan` on
+NumPy arrays against the same formulas evaluated row by row in Python.
+Then seeds a throwaway database with a smaller inventory and snapshot
+history and times `plan_inventory` end to end (SQLite load included), for
+the whole inventory and for just a batch of low items as /upload-all does,
+comparing the order value against the old flat 500 units per low item.
+
+    python benchmarks/bench_reorder.py --skus 1000000 --snapshots 12 --db-skus 100000
+"""
+import argparse, math, os, tempfile, time
+
+import common
+
+import numpy as np
+import app as msme
+from reorder_engine import DAY, PRIOR_CV, ReorderEngine, demand_stats
+
+
+def history(n, snapshots, seed=5):
+    """Snapshot arrays sorted by (item, time) plus the final stock/min_limit/cost per item."""
+    rng = np.random.default_rng(seed)
+    rate = rng.gamma(2.0, 5.0, n)
+    gaps = rng.uniform(0.5, 2.0, (n, snapshots)) # days between imports
+    used = rng.poisson(rate[:, None] * gaps)
+    receipts = np.where(rng.random((n, snapshots)) < 0.15, rng.integers(100, 600, (n, snapshots)), 0)
+    start = rng.integers(50, 400, n)
+    stock = np.maximum(start[:, None] + np.cumsum(receipts - used, axis=1), 0)
+    taken_at = time.time() - 30 * DAY + np.cumsum(gaps, axis=1) * DAY
+    pos = np.repeat(np.arange(n), snapshots)
+    min_limit = rng.integers(5, 80, n).astype(float)
+    cost = rng.uniform(5, 500, n)
+    return pos, taken_at.ravel(), stock.ravel().astype(float), stock[:, -1].astype(float), min_limit, cost
+
+
+def vectorized(engine, pos, taken_at, stock, final, min_limit, cost):
+    demand, std, observed = demand_stats(pos, taken_at, stock, len(final))
+    return engine.plan(np.arange(len(final)), final, min_limit, cost, demand, std, observed)
+
+
+def per_row(engine, pos, taken_at, stock, final, min_limit, cost):
+    """The same policy, one item at a time in plain Python."""
+    snapshots = len(pos) // len(final)
+    units = []
+    for k in range(len(final)):
+        rows = range(k * snapshots, (k + 1) * snapshots)
+        rates, days_total, used_total = [], 0.0, 0.0
+        for a, b in zip(rows, rows[1:]):
+            days = (taken_at[b] - taken_at[a]) / DAY
+            used = max(stock[a] - stock[b], 0.0)
+            rates.append((used / days, days))
+            days_total += days
+            used_total += used
+        if days_total >= engine.min_history_days:
+            daily = used_total / days_total
+            sigma = math.sqrt(sum(d * (r - daily) ** 2 for r, d in rates) / days_total)
+        else:
+            daily = min_limit[k] / engine.lead_time_days
+            sigma = daily * PRIOR_CV
+        safety = engine.z * sigma * math.sqrt(engine.lead_time_days)
+        reorder_point = daily * engine.lead_time_days + safety
+        eoq = min(math.sqrt(2 * daily * 365 * engine.order_cost / max(cost[k] * engine.holding_rate, 0.01)), daily * 365)
+        units.append(math.ceil(max(eoq, reorder_point - final[k], min_limit[k] - final[k], 1)))
+    return units
+
+
+def seed_db(n, snapshots):
+    msme.init_db()
+    pos, taken_at, stock, final, min_limit, cost = history(n, snapshots, seed=9)
+    names = [f"SKU-{k:07d}" for k in range(n)]
+    with msme.get_db() as conn:
+        conn.executemany('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit)
+                            VALUES (?, 0, 0, '', ?, ?, ?)''',
+                         zip(names, cost.tolist(), final.astype(int).tolist(), min_limit.astype(int).tolist()))
+        conn.executemany("INSERT INTO stock_snapshots (item_name, stock, taken_at, source) VALUES (?, ?, ?, 'import')",
+                         ((names[p], s, t) for p, s, t in zip(pos.tolist(), stock.astype(int).tolist(), taken_at.tolist())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skus', type=int, default=1_000_000)
+    parser.add_argument('--snapshots', type=int, default=12)
+    parser.add_argument('--loop-skus', type=int, default=100_000, help='SKUs timed with the per-row loop')
+    parser.add_argument('--db-skus', type=int, default=100_000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--low-skus', type=int, default=1000, help='newly low items planned on their own')
+    args = parser.parse_args()
+    engine = ReorderEngine()
+
+    pos, taken_at, stock, final, min_limit, cost = history(args.skus, args.snapshots)
+    stats_times, plan_times = [], []
+    for _ in range(args.rounds):
+        t0 = time.perf_counter()
+        stats = demand_stats(pos, taken_at, stock, args.skus)
+        t1 = time.perf_counter()
+        plan = engine.plan(np.arange(args.skus), final, min_limit, cost, *stats)
+        stats_times.append(t1 - t0)
+        plan_times.append(time.perf_counter() - t1)
+    best = min(stats_times) + min(plan_times)
+    print(f"{args.skus:,} SKUs x {args.snapshots} snapshots (best of {args.rounds})")
+    print(f"  demand_stats      {min(stats_times) * 1000:8.1f} ms  ({len(pos):,} snapshots)")
+    print(f"  plan              {min(plan_times) * 1000:8.1f} ms")
+    print(f"  vectorized total  {best * 1000:8.1f} ms  ({args.skus / best / 1e6:.1f}M SKUs/s)")
+
+    m = min(args.loop_skus, args.skus)
+    small = history(m, args.snapshots)
+    t0 = time.perf_counter()
+    loop_units = per_row(engine, *small)
+    loop = time.perf_counter() - t0
+    assert np.array_equal(np.array(loop_units), vectorized(engine, *small).units), "per-row and vectorized plans differ"
+    print(f"  per-row loop      {loop / m * args.skus * 1000:8.1f} ms  (extrapolated from {m:,} SKUs, same units)")
+    print(f"  needs reorder     {int(plan.needs_reorder.sum()):,} SKUs, median {np.median(plan.units[plan.needs_reorder]):.0f} units")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'reorder.db'))
+        t0 = time.perf_counter()
+        seed_db(args.db_skus, args.snapshots)
+        print(f"\nSeeded {args.db_skus:,} items / {args.db_skus * args.snapshots:,} snapshots in {time.perf_counter() - t0:.1f}s")
+        with msme.get_db() as conn:
+            t0 = time.perf_counter()
+            plan = msme.reorder_engine.plan_inventory(conn)
+            elapsed = time.perf_counter() - t0
+            low = plan.stock < plan.min_limit
+            t0 = time.perf_counter()
+            msme.reorder_engine.plan_inventory(conn, plan.ids[low][:args.low_skus])
+            subset = time.perf_counter() - t0
+        print(f"  plan_inventory    {elapsed * 1000:8.1f} ms  (SQLite load + plan)")
+        print(f"  low items only    {subset * 1000:8.1f} ms  ({min(args.low_skus, int(low.sum())):,} ids, as /upload-all plans them)")
+        print(f"  low-stock items   {int(low.sum()):,}: order value ₹{(plan.cost[low] * plan.units[low]).sum():,.0f} "
+              f"vs ₹{(plan.cost[low] * 500).sum():,.0f} at a flat 500 units")
+
+
+if __name__ == '__main__':
+    main()
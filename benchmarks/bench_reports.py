@@ -0,0 +1,94 @@
+"""Render latency of /reports with many stored WhatsApp insights.
+
+Seeds a throwaway database with N insights (multi-KB chat text, leads and
+urgent tasks), then compares the original page — every row including
+`raw_text`/`processed_json`, `json.loads` per card on every render — with
+the current paginated view over the timestamp index and the normalized
+lead/task tables. Reports p50/p99 latency and response size.
+
+    python benchmarks/bench_reports.py --insights 50000
+"""
+import argparse, json, os, random, statistics, tempfile, time
+
+import common
+
+import app as msme
+from flask import render_template_string
+
+# The original insight loop, as reports.html rendered it before pagination
+LEGACY_TEMPLATE = """{% extends 'base.html' %}{% block content %}
+{% for i in insights %}{% set data = i.processed_json | from_json %}
+<div class="insight-card {{ i.sentiment }}"><span>{{ i.sentiment }} Sentiment</span><span>₹{{ i.revenue }}</span>
+<p>{{ i.summary }}</p>{% for lead in data.leads %}<span class="data-pill">{{ lead }}</span>{% endfor %}
+{% for task in data.urgent_tasks %}<span class="data-pill">! {{ task }}</span>{% endfor %}
+<span>Analyzed on {{ i.timestamp }}</span></div>{% endfor %}
+<span>₹{{ total_revenue }}</span><span>{{ pos_count }}</span>{% endblock %}"""
+
+
+def seed(n):
+    msme.init_db()
+    rnd = random.Random(21)
+    chat = "12/01/24, 10:30 - Customer: Need 200 pcs of denim, what's the rate? Delivery by Friday please.\n" * 25
+    with msme.get_db() as conn:
+        for k in range(n):
+            analysis = {'summary': f"Bulk enquiry #{k} for denim and zippers", 'revenue_potential': rnd.choice([0, 1500]),
+                        'sentiment': rnd.choice(['Positive', 'Neutral', 'Negative']),
+                        'leads': [f"Retailer {k}", f"Boutique {k % 97}"], 'urgent_tasks': [f"Quote by Friday ({k})"]}
+            day = f"2025-{1 + k * 12 // n:02d}-{1 + k % 28:02d} {k % 24:02d}:00:00"
+            cur = conn.execute('''INSERT INTO whatsapp_insights (raw_text, processed_json, summary, sentiment, revenue, timestamp)
+                                  VALUES (?, ?, ?, ?, ?, ?)''', (chat, json.dumps(analysis), analysis['summary'],
+                                                                 analysis['sentiment'], analysis['revenue_potential'], day))
+            msme.save_insight_details(conn, cur.lastrowid, analysis)
+
+
+def legacy_reports():
+    with msme.get_db() as conn:
+        insights = conn.execute('SELECT * FROM whatsapp_insights ORDER BY timestamp DESC').fetchall()
+        kpi = msme.read_kpis(conn)
+    return render_template_string(LEGACY_TEMPLATE, insights=insights, total_revenue=kpi['potential_revenue'],
+                                  pos_count=kpi['positive'])
+
+
+def measure(client, paths, n):
+    samples, size = [], 0
+    for k in range(n):
+        t0 = time.perf_counter()
+        resp = client.get(paths[k % len(paths)])
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert resp.status_code == 200, resp.status_code
+        size = max(size, len(resp.data))
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))], size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--insights', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--legacy-requests', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'reports.db'))
+        t0 = time.perf_counter()
+        seed(args.insights)
+        print(f"Seeded {args.insights:,} insights in {time.perf_counter() - t0:.1f}s")
+
+        msme.app.add_template_filter(json.loads, 'from_json')
+        msme.app.add_url_rule('/legacy-reports', 'legacy_reports', legacy_reports)
+        client = msme.app.test_client()
+        with msme.get_db() as conn:
+            mid = conn.execute('SELECT id FROM whatsapp_insights ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?',
+                               (args.insights // 2,)).fetchone()[0]
+
+        print(f"{'view':34} {'p50':>10} {'p99':>10} {'bytes':>12}")
+        for label, paths, n in (("all rows + from_json (old)", ['/legacy-reports'], args.legacy_requests),
+                                ("paginated, first page", ['/reports'], args.requests),
+                                ("paginated, deep page (keyset)", [f'/reports?before={mid}'], args.requests),
+                                ("paginated, one-month filter", ['/reports?from=2025-06-01&to=2025-06-30'], args.requests)):
+            p50, p99, size = measure(client, paths, n)
+            print(f"{label:34} {p50:8.1f}ms {p99:8.1f}ms {size:12,}")
+
+
+if __name__ == '__main__':
+    main()
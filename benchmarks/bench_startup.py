@@ -0,0 +1,119 @@
+"""Cold start and per-worker memory of the web app.
+
+Each scenario runs in a fresh interpreter against a throwaway database:
+  - boot: `import app` as gunicorn does (schema init, no LLM client), then
+    the first GET /;
+  - boot + LLM client: the same, but the Groq client is built up front, as
+    importing app.py used to;
+  - forked workers: a parent boots the app and forks `--workers` children
+    (gunicorn --preload style); each serves `--requests` page views and
+    reports its private (USS) and proportional (PSS) memory;
+  - background worker: worker.py's services started in their own process.
+
+    python benchmarks/bench_startup.py --runs 5 --workers 4
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile, time
+
+from common import ROOT
+
+
+def memory(pid='self'):
+    """(rss, pss, uss) in MB from /proc; zeros where smaps_rollup is unavailable."""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        pass
+    return (fields.get('Rss', 0.0), fields.get('Pss', 0.0),
+            fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0))
+
+
+def child(mode, workers, requests):
+    t0 = time.perf_counter()
+    import app as msme
+    if mode == 'eager':
+        msme.llm_backend.client
+    boot = time.perf_counter() - t0
+    client = msme.app.test_client()
+    t0 = time.perf_counter()
+    client.get('/')
+    first = time.perf_counter() - t0
+    result = {'boot': boot, 'first_request': first, 'rss': memory()[0], 'groq_loaded': 'groq' in sys.modules}
+
+    if mode in ('fork', 'fork-eager'):
+        if mode == 'fork-eager':
+            msme.llm_backend.client
+        pipes = []
+        for _ in range(workers):
+            r, w = os.pipe()
+            if os.fork() == 0:
+                os.close(r)
+                c = msme.app.test_client()
+                for k in range(requests):
+                    c.get(f'/inventory?page={k % 5 + 1}')
+                os.write(w, json.dumps(memory()).encode())
+                os._exit(0)
+            os.close(w)
+            pipes.append(r)
+        stats = []
+        for r in pipes:
+            with os.fdopen(r) as f:
+                stats.append(json.loads(f.read()))
+            os.wait()
+        result['workers'] = stats
+
+    if mode == 'worker':
+        t0 = time.perf_counter()
+        msme.start_background_services()
+        result['services_start'] = time.perf_counter() - t0
+        time.sleep(1.0) # let the watcher and schedulers make their first pass
+        result['rss'] = memory()[0]
+    print(json.dumps(result))
+
+
+def run(mode, tmp, workers=0, requests=0):
+    # One database file across runs, so only the first boot migrates it
+    env = {**os.environ, 'DB_PATH': os.path.join(tmp, 'startup.db'), 'PYTHONPATH': ROOT}
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode,
+                          '--workers', str(workers), '--requests', str(requests)],
+                         cwd=tmp, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child, args.workers, args.requests)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run('lazy', tmp) # first boot creates the schema; the timed runs see a migrated database
+        print(f"{'scenario':24} {'boot':>9} {'first GET /':>12} {'RSS':>9} {'groq loaded':>12}")
+        for mode, label in (('lazy', 'boot'), ('eager', 'boot + LLM client')):
+            runs = [run(mode, tmp) for _ in range(args.runs)]
+            print(f"{label:24} {statistics.median(r['boot'] for r in runs) * 1000:7.0f}ms "
+                  f"{statistics.median(r['first_request'] for r in runs) * 1000:10.1f}ms "
+                  f"{statistics.median(r['rss'] for r in runs):7.1f}MB {str(runs[0]['groq_loaded']):>12}")
+
+        print(f"\n{args.workers} forked workers x {args.requests} page views (per worker, median)")
+        print(f"{'parent before fork':24} {'USS':>9} {'PSS':>9} {'RSS':>9}")
+        for mode, label in (('fork', 'boot'), ('fork-eager', 'boot + LLM client')):
+            workers = run(mode, tmp, args.workers, args.requests)['workers']
+            rss, pss, uss = (statistics.median(w[k] for w in workers) for k in range(3))
+            print(f"{label:24} {uss:7.1f}MB {pss:7.1f}MB {rss:7.1f}MB")
+
+        bg = run('worker', tmp)
+        print(f"\nworker.py services: started in {bg['services_start'] * 1000:.0f}ms, "
+              f"RSS {bg['rss']:.1f}MB after their first pass")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Time-to-first-token for /ai-query and /edit-agent: blocking JSON vs server-sent events.
+
+Drives both endpoints in-process against a fake streaming LLM (`--latency`
+seconds to the first token, then `--token-latency` per word of a ~150-word
+reply). For the JSON variant the first byte is the whole answer; for SSE it
+is the first `token` event. Also checks that the streamed draft was
+persisted to `negotiations.draft` once the stream completed.
+
+    python benchmarks/bench_streaming.py --requests 10 --latency 0.4 --token-latency 0.02
+"""
+import argparse, json, os, statistics, tempfile, time
+
+import common
+
+import app as msme
+from fake_llm import FakeLLMClient
+from llm_provider import LLMProvider
+
+DRAFT = ("Subject: Restock Request for Denim Raw\n\nDear Supplier,\n\n" +
+         "Our inventory system flagged this item as low on stock and we would like to place a firm order. " * 8 +
+         "\n\nRegards,\nProcurement")
+
+
+def seed():
+    msme.init_db()
+    with msme.get_db() as conn:
+        conn.execute('''INSERT INTO inventory (name, mrp, sp, discount, cost, stock, min_limit)
+                        VALUES ('Denim Raw', 300, 250, '10%', 180, 4, 50)''')
+        conn.execute("INSERT INTO suppliers VALUES ('Denim Raw', 'Arvind Mills', 'orders@arvind.com')")
+        conn.execute('''INSERT INTO negotiations (item_name, supplier_email, draft, invoice_amount, status)
+                        VALUES ('Denim Raw', 'orders@arvind.com', 'old draft', 90000, 'AWAITING_HUMAN')''')
+        return conn.execute('SELECT id FROM negotiations').fetchone()[0]
+
+
+def timed(client, path, body, stream):
+    headers = {'Accept': 'text/event-stream'} if stream else {}
+    t0 = time.perf_counter()
+    resp = client.post(path, json=body, headers=headers, buffered=False)
+    first, events = None, []
+    for chunk in resp.response:
+        if first is None and chunk.strip():
+            first = time.perf_counter() - t0
+        events.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+    total = time.perf_counter() - t0
+    resp.close()
+    return first, total, "".join(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.4, help='fake LLM seconds to first token')
+    parser.add_argument('--token-latency', type=float, default=0.02, help='fake LLM seconds per generated word')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'stream.db'))
+        neg_id = seed()
+        # Straight to the fake client: the response cache would turn repeats into instant hits
+        msme.llm = LLMProvider(FakeLLMClient(latency=args.latency, token_latency=args.token_latency,
+                                                 reply=lambda model, messages, **params: DRAFT))
+        client = msme.app.test_client()
+        cases = [('/ai-query', {'query': 'Which denim items should I restock?'}),
+                 ('/edit-agent', {'id': neg_id, 'instruction': 'ask for 600 units with 10% discount'})]
+        print(f"fake LLM: {args.latency * 1000:.0f} ms to first token + {args.token_latency * 1000:.0f} ms/word, "
+              f"~{len(DRAFT.split())} words per reply")
+        print(f"{'endpoint':12} {'mode':6} {'first byte p50':>15} {'complete p50':>13}")
+        for path, body in cases:
+            for mode in ('json', 'sse'):
+                samples = [timed(client, path, body, mode == 'sse') for _ in range(args.requests)]
+                print(f"{path:12} {mode:6} {statistics.median(s[0] for s in samples) * 1000:12.0f} ms "
+                      f"{statistics.median(s[1] for s in samples) * 1000:10.0f} ms")
+
+        _, _, stream = timed(client, '/edit-agent', {'id': neg_id, 'instruction': 'final check 700 units'}, True)
+        done = json.loads(stream.rsplit("event: done\ndata: ", 1)[1])
+        with msme.get_db() as conn:
+            saved = conn.execute('SELECT draft, units FROM negotiations WHERE id=?', (neg_id,)).fetchone()
+        print(f"\nstreamed draft persisted: {saved['draft'] == done['new_draft'] == DRAFT} (units={saved['units']})")
+
+
+if __name__ == '__main__':
+    main()
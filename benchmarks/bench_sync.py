@@ -0,0 +1,142 @@
+"""Re-importing a large inventory file: wipe-and-reload vs the diff import.
+
+Loads an N-item inventory (plus suppliers and open negotiations for the
+low-stock items), then re-imports a copy of the file in which a fraction of
+rows changed stock. The baseline is the original upload path — DELETE the
+tables and negotiations, bulk insert everything, redraft every low item;
+the new path is `sync_inventory`/`sync_suppliers`, which writes only the
+changed rows and drafts only items that newly fell below `min_limit`.
+Reports time per phase, rows written and drafts that would be queued.
+Finally re-imports while another connection commits mid-import (as the
+ingest workers do), which must neither fail the import nor lose the write.
+
+    python benchmarks/bench_sync.py --rows 500000 --changed 0.01
+"""
+import argparse, csv, io, os, random, tempfile, threading, time
+
+import common
+
+import app as msme
+from csv_importer import import_inventory, import_suppliers, sync_inventory, sync_suppliers
+
+
+def files(rows, changed, seed=3):
+    """(first inventory csv, re-import csv with `changed` of the rows restocked/sold, supplier csv) as bytes."""
+    rnd = random.Random(seed)
+    items = [[f"Fabric Roll {n:07d}", round(rnd.uniform(5, 500), 2), rnd.randint(0, 400), rnd.randint(5, 40)]
+             for n in range(rows)]
+
+    def render(items):
+        out = io.StringIO()
+        w = csv.writer(out)
+        w.writerow(['item', 'mrp', 'sp', 'discount', 'cost', 'stock', 'min_limit'])
+        w.writerows([name, round(cost * 1.5, 2), round(cost * 1.3, 2), '13%', cost, stock, low]
+                    for name, cost, stock, low in items)
+        return out.getvalue().encode()
+
+    first = render(items)
+    for k in rnd.sample(range(rows), int(rows * changed)):
+        items[k][2] = max(0, items[k][2] + rnd.randint(-60, 60))
+    suppliers = io.StringIO()
+    csv.writer(suppliers).writerows([['item', 'supplier_name', 'supplier_email']] +
+                                    [[name, f"Mill {n % 50}", f"mill{n % 50}@example.com"] for n, (name, *_) in enumerate(items)])
+    return first, render(items), suppliers.getvalue().encode()
+
+
+def open_negotiations(conn):
+    conn.execute('''INSERT INTO negotiations (item_name, supplier_email, status, invoice_amount)
+                    SELECT name, 'x@example.com', 'AWAITING_HUMAN', cost * 500 FROM inventory WHERE stock < min_limit''')
+
+
+def low_items(conn):
+    return conn.execute('SELECT COUNT(*) FROM inventory WHERE stock < min_limit').fetchone()[0]
+
+
+def import_during_commit(data):
+    """Re-imports `data` while another thread commits an insight right after the diff has read `inventory`
+    (the window in which a deferred transaction's first write used to fail with "database is locked")."""
+    outcome = {}
+
+    def write():
+        try:
+            with msme.get_db() as other:
+                other.execute('''INSERT INTO whatsapp_insights (raw_text, processed_json, summary, sentiment, revenue)
+                                 VALUES ('mid-import', '{}', 'mid-import', 'Neutral', 0)''')
+            outcome['writer'] = 'committed'
+        except Exception as e:
+            outcome['writer'] = repr(e)
+
+    writer, seen = threading.Thread(target=write), []
+
+    def hook(verb, seconds):
+        if verb == 'CREATE' and seen[-1:] == ['DROP']: # CREATE TEMP TABLE inventory_diff AS SELECT ... FROM inventory
+            writer.start()
+            writer.join(0.5) # blocked on the write lock, as it should be
+        seen.append(verb)
+
+    with msme.get_db(write=True) as conn:
+        conn.on_query = hook
+        try:
+            report = sync_inventory(conn, io.BytesIO(data))
+        finally:
+            conn.on_query = msme.db.on_query
+    writer.join()
+    with msme.get_db() as conn:
+        outcome['rows'] = conn.execute("SELECT COUNT(*) FROM whatsapp_insights WHERE raw_text = 'mid-import'").fetchone()[0]
+    return report, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--changed', type=float, default=0.01, help='fraction of rows whose stock changed')
+    args = parser.parse_args()
+    first, second, suppliers = files(args.rows, args.changed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'sync.db'))
+        msme.init_db()
+        with msme.get_db() as conn:
+            sync_inventory(conn, io.BytesIO(first))
+            sync_suppliers(conn, io.BytesIO(suppliers))
+            open_negotiations(conn)
+        print(f"{args.rows:,} items, {args.changed:.1%} changed on re-import")
+
+        # Wipe and reload, as upload_all used to
+        with msme.get_db() as conn:
+            t0 = time.perf_counter()
+            for table in ('inventory', 'suppliers', 'negotiations'):
+                conn.execute(f'DELETE FROM {table}')
+            inv = import_inventory(conn, io.BytesIO(second))
+            import_suppliers(conn, io.BytesIO(suppliers))
+            drafts = low_items(conn)
+            legacy = time.perf_counter() - t0
+        print(f"  wipe + reload      {legacy:7.2f}s  {inv.inserted:>9,} rows written, {drafts:,} drafts queued, "
+              f"every open negotiation dropped")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        msme.db.configure(os.path.join(tmp, 'sync.db'))
+        msme.init_db()
+        with msme.get_db() as conn:
+            sync_inventory(conn, io.BytesIO(first))
+            sync_suppliers(conn, io.BytesIO(suppliers))
+            open_negotiations(conn)
+            kept = conn.execute('SELECT COUNT(*) FROM negotiations').fetchone()[0]
+        with msme.get_db() as conn:
+            t0 = time.perf_counter()
+            inv = sync_inventory(conn, io.BytesIO(second))
+            sup = sync_suppliers(conn, io.BytesIO(suppliers))
+            elapsed = time.perf_counter() - t0
+            movements = conn.execute("SELECT COUNT(*) FROM stock_movements WHERE ref = 'import:2'").fetchone()[0]
+        phases = ', '.join(f"{name} {secs:.2f}s" for name, secs in inv.phases.items())
+        print(f"  diff import        {elapsed:7.2f}s  {inv.added + inv.updated + inv.removed:>9,} rows written, "
+              f"{len(inv.newly_low):,} drafts queued, {kept:,} open negotiations kept")
+        print(f"    inventory: {phases}; suppliers {sup.elapsed:.2f}s; {movements:,} ledger movements")
+
+        report, outcome = import_during_commit(first)
+        assert outcome == {'writer': 'committed', 'rows': 1}, outcome
+        print(f"  commit mid-import  {report.elapsed:7.2f}s  import and the concurrent write both committed")
+
+
+if __name__ == '__main__':
+    main()
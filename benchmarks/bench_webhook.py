@@ -0,0 +1,98 @@
+"""Load generator for /webhook/whatsapp.
+
+Fires a burst of Twilio-style webhook posts from concurrent clients (about
+10% of them are verbatim provider retries) and reports acknowledgement
+latency and sustained throughput, then how long the ingest workers took to
+drain the queue against a fake LLM.
+
+    python benchmarks/bench_webhook.py --requests 2000 --concurrency 16
+    python benchmarks/bench_webhook.py --url http://127.0.0.1:5000   # against a running server
+"""
+import argparse, json, os, random, statistics, tempfile, threading, time, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+
+TEXTS = ["Good morning", "Need 200 pcs zippers urgently, what's the rate?", "Is Ramesh coming to the shop today?",
+         "Payment of ₹12,000 sent, share invoice", "👍", "Delivery was late again, customer is angry"]
+
+
+def payloads(n):
+    rnd = random.Random(5)
+    out = []
+    for k in range(n):
+        if out and rnd.random() < 0.1:
+            out.append(rnd.choice(out)) # provider retry of an earlier message
+        else:
+            out.append({'MessageSid': f"SM{k:08d}", 'Body': rnd.choice(TEXTS), 'From': 'whatsapp:+910000000000'})
+    return out
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.1, help='fake LLM seconds per call (in-process mode)')
+    parser.add_argument('--url', help='base URL of a running server; default drives the app in-process')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            def post(body):
+                req = urllib.request.Request(args.url.rstrip('/') + '/webhook/whatsapp',
+                                             data=urllib.parse.urlencode(body).encode(), method='POST')
+                with urllib.request.urlopen(req) as resp:
+                    return resp.status, json.loads(resp.read())
+        else:
+            import app as msme
+            from fake_llm import FakeLLMClient
+            from llm_provider import LLMProvider
+            msme.db.configure(os.path.join(tmp, 'webhook.db'))
+            msme.init_db()
+            fake = FakeLLMClient(latency=args.latency)
+            msme.llm = msme.gatekeeper.llm = LLMProvider(fake)
+            local = threading.local()
+
+            def post(body):
+                if not hasattr(local, 'client'):
+                    local.client = msme.app.test_client()
+                resp = local.client.post('/webhook/whatsapp', data=body)
+                return resp.status_code, resp.get_json()
+
+        def timed(body):
+            t0 = time.perf_counter()
+            status, reply = post(body)
+            return (time.perf_counter() - t0) * 1000, status, reply['status']
+
+        bodies = payloads(args.requests)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(timed, bodies))
+        elapsed = time.perf_counter() - t0
+
+        latencies = sorted(r[0] for r in results)
+        statuses = {}
+        for _, code, status in results:
+            statuses[f"{code} {status}"] = statuses.get(f"{code} {status}", 0) + 1
+        print(f"{len(bodies)} webhook posts, {args.concurrency} concurrent clients: "
+              f"{len(bodies) / elapsed:,.0f} req/s")
+        print(f"ack latency ms  p50 {statistics.median(latencies):.2f}  p99 {percentile(latencies, 0.99):.2f}  "
+              f"max {latencies[-1]:.2f}")
+        print(f"responses: {statuses}")
+
+        if not args.url:
+            t0 = time.perf_counter()
+            msme.ingest_workers.start()
+            while msme.ingest_queue.depth()['pending'] or msme.ingest_queue.depth()['processing']:
+                time.sleep(0.05)
+            msme.ingest_workers.stop()
+            print(f"queue drained in {time.perf_counter() - t0:.2f}s with {fake.calls} LLM calls: "
+                  f"{msme.ingest_queue.depth()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+"""Shared setup for the benchmark scripts: import it before `app`.
+
+Puts the repository root on sys.path and defaults the environment app.py
+reads at import: a placeholder GROQ_API_KEY (benchmarks drive the fake LLM),
+an in-memory LLM cache, and DB_PATH=":memory:" since each benchmark points
+`db.configure()` at its own throwaway file. Variables already set win.
+"""
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+for name, value in (('GROQ_API_KEY', 'bench-not-used'), ('LLM_CACHE_DB', ':memory:'), ('DB_PATH', ':memory:')):
+    os.environ.setdefault(name, value)
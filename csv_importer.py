@@ -0,0 +1,277 @@
+"""Streaming CSV importer for inventory and supplier files.
+
+Reads rows straight from an upload stream (or any file object), resolves the
+flexible header mapping once per file, and inserts in `executemany` batches.
+Rows that fail to parse are collected in the report instead of aborting the
+import. Callers own the transaction: nothing here commits.
+
+`sync_inventory`/`sync_suppliers` stage the file in a temp table and diff it
+against the live table by item name: only added/changed rows are written,
+rows missing from the file are removed, and every stock change goes to the
+`stock_movements` ledger.
+
+Inserts into `inventory` run under `bulk_insert`: the per-row KPI and search
+index triggers stand down (their WHEN clause reads `inventory_bulk.active`)
+and catch up in one statement each when the load ends.
+"""
+import csv, io, time
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+from stock_ledger import begin_import, finish_import
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+# Accepted header names per column, in priority order (first non-empty value wins)
+INVENTORY_HEADERS = {
+    'name': ('item', 'name', 'Item Name'),
+    'mrp': ('mrp', 'MRP'),
+    'sp': ('sp', 'Selling Price'),
+    'discount': ('discount', 'Discount'),
+    'cost': ('price', 'cost', 'Cost Price'),
+    'stock': ('stock', 'Stock'),
+    'min_limit': ('min_limit', 'Threshold', 'Min Limit'),
+}
+SUPPLIER_HEADERS = {
+    'item_name': ('item', 'item_name', 'Product'),
+    'name': ('supplier_name', 'Supplier', 'Name'),
+    'email': ('supplier_email', 'Email', 'Contact'),
+}
+
+def _to_int(value):
+    return int(float(value))
+
+# column -> (parser, default when the cell is missing/empty)
+INVENTORY_TYPES = {
+    'name': (str, None),
+    'mrp': (float, 0.0),
+    'sp': (float, 0.0),
+    'discount': (str, '0%'),
+    'cost': (float, 0.0),
+    'stock': (_to_int, 0),
+    'min_limit': (_to_int, 10),
+}
+SUPPLIER_TYPES = {
+    'item_name': (str, None),
+    'name': (str, None),
+    'email': (str, None),
+}
+
+
+class ImportReport:
+    def __init__(self, table):
+        self.table = table
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = [] # (line_no, reason), capped at MAX_REPORTED_ERRORS
+        self.elapsed = 0.0
+
+    def reject(self, line_no, reason):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, reason))
+
+    @property
+    def rows_per_sec(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.table}: {self.inserted} inserted, {self.rejected} rejected "
+                f"in {self.elapsed:.2f}s ({self.rows_per_sec:,.0f} rows/s)")
+
+
+class SyncReport(ImportReport):
+    """Diff import outcome; `inserted` counts rows read from the file."""
+
+    def __init__(self, table):
+        super().__init__(table)
+        self.added = self.updated = self.unchanged = self.removed = 0
+        self.newly_low = [] # item names that fell below min_limit with this import
+        self.phases = {} # phase -> seconds
+
+    def __str__(self):
+        phases = ', '.join(f"{name} {secs:.2f}s" for name, secs in self.phases.items())
+        return (f"{self.table}: {self.inserted} rows read -> {self.added} added, {self.updated} updated, "
+                f"{self.unchanged} unchanged, {self.removed} removed, {len(self.newly_low)} newly low, "
+                f"{self.rejected} rejected in {self.elapsed:.2f}s ({phases})")
+
+
+def init_bulk_insert(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS inventory_bulk
+                 (id INTEGER PRIMARY KEY CHECK (id = 1), active INTEGER NOT NULL DEFAULT 0,
+                  after_id INTEGER NOT NULL DEFAULT 0)''')
+    conn.execute('INSERT OR IGNORE INTO inventory_bulk (id) VALUES (1)')
+
+# WHEN clause for per-row AFTER INSERT triggers on inventory; a trigger using it needs a companion
+# AFTER UPDATE OF active ON inventory_bulk trigger that covers rows with id > old.after_id in one go.
+ROW_BY_ROW = 'NOT (SELECT active FROM inventory_bulk WHERE id = 1)'
+
+@contextmanager
+def bulk_insert(conn):
+    """Defers the inventory insert triggers to one set-based catch-up when the block ends."""
+    conn.execute('''UPDATE inventory_bulk SET active = 1, after_id = (SELECT COALESCE(MAX(id), 0) FROM inventory)
+                    WHERE id = 1''')
+    try:
+        yield
+    finally:
+        conn.execute('UPDATE inventory_bulk SET active = 0 WHERE id = 1')
+
+def text_stream(f):
+    """Wraps binary upload streams (werkzeug FileStorage, open(..., 'rb')) for the csv module."""
+    f = getattr(f, 'stream', f)
+    if isinstance(f, io.TextIOBase):
+        return f
+    return io.TextIOWrapper(f, encoding='utf-8-sig', newline='')
+
+def resolve_headers(fieldnames, aliases):
+    """Maps each target column to the indexes of the source columns that may hold it."""
+    positions = {h.strip(): i for i, h in reversed(list(enumerate(fieldnames)))}
+    return {col: tuple(positions[a] for a in names if a in positions) for col, names in aliases.items()}
+
+def _parse_rows(reader, mapping, types, required, report):
+    width = max((i for indexes in mapping.values() for i in indexes), default=-1) + 1
+    columns = [(col, indexes, *types[col]) for col, indexes in mapping.items()]
+    required_pos = [pos for pos, col in enumerate(mapping) if col in required]
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row += [''] * (width - len(row))
+        values = []
+        try:
+            for col, indexes, parse, default in columns:
+                raw = ''
+                for i in indexes:
+                    raw = row[i]
+                    if raw:
+                        break
+                values.append(parse(raw) if raw else default)
+        except ValueError as e:
+            report.reject(reader.line_num, f"{col}: {e}")
+            continue
+        missing = [columns[pos][0] for pos in required_pos if not values[pos]]
+        if missing:
+            report.reject(reader.line_num, f"missing {', '.join(missing)}")
+            continue
+        yield values
+
+def import_rows(conn, table, f, aliases, types, required, batch_size=BATCH_SIZE, into=None, report=None):
+    """Inserts the file's rows into `into` (default: `table`)."""
+    report = report or ImportReport(table)
+    started = time.perf_counter()
+    stream = text_stream(f)
+    try:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        mapping = resolve_headers(header or [], aliases)
+        if not any(mapping[col] for col in required):
+            report.reject(1, f"no recognised header for {', '.join(required)} in {header}")
+            return report
+        sql = f"INSERT INTO {into or table} ({', '.join(mapping)}) VALUES ({', '.join('?' * len(mapping))})"
+        rows = _parse_rows(reader, mapping, types, required, report)
+        with bulk_insert(conn) if (into or table) == 'inventory' else nullcontext():
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                conn.executemany(sql, batch)
+                report.inserted += len(batch)
+    finally:
+        if stream is not f and isinstance(stream, io.TextIOWrapper):
+            stream.detach() # leave the caller's binary stream open
+        report.elapsed = time.perf_counter() - started
+    return report
+
+def import_inventory(conn, f, batch_size=BATCH_SIZE):
+    return import_rows(conn, 'inventory', f, INVENTORY_HEADERS, INVENTORY_TYPES, ('name',), batch_size)
+
+def import_suppliers(conn, f, batch_size=BATCH_SIZE):
+    return import_rows(conn, 'suppliers', f, SUPPLIER_HEADERS, SUPPLIER_TYPES, ('item_name', 'name'), batch_size)
+
+_INVENTORY_COLUMNS = ', '.join(INVENTORY_TYPES)
+_INVENTORY_CHANGED = ' OR '.join(f'o.{col} IS NOT n.{col}' for col in INVENTORY_TYPES if col != 'name')
+
+def sync_inventory(conn, f, source='upload', batch_size=BATCH_SIZE):
+    """Diff-imports a full inventory file against the live table, keyed by item name.
+
+    The last row wins when a name repeats in the file. An empty or unreadable
+    file changes nothing (rather than removing every item). Run it in a
+    transaction that already holds the write lock (`connect(write=True)`):
+    the diff reads `inventory` before the first write to it.
+    """
+    report = SyncReport('inventory')
+    started = time.perf_counter()
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS inventory_import
+                 (name TEXT PRIMARY KEY ON CONFLICT REPLACE, mrp REAL, sp REAL, discount TEXT, cost REAL,
+                  stock INTEGER, min_limit INTEGER)''')
+    conn.execute('DELETE FROM temp.inventory_import')
+    import_rows(conn, 'inventory', f, INVENTORY_HEADERS, INVENTORY_TYPES, ('name',), batch_size,
+                into='temp.inventory_import', report=report)
+    report.phases['parse'] = time.perf_counter() - started
+    if not report.inserted:
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    mark = time.perf_counter()
+    conn.execute('DROP TABLE IF EXISTS temp.inventory_diff')
+    conn.execute(f'''CREATE TEMP TABLE inventory_diff AS
+                    SELECT n.*, o.stock AS old_stock, o.min_limit AS old_min_limit, o.id IS NULL AS added
+                    FROM temp.inventory_import n
+                    LEFT JOIN inventory o ON o.id = (SELECT MIN(id) FROM inventory WHERE name = n.name)
+                    WHERE o.id IS NULL OR {_INVENTORY_CHANGED}''')
+    staged, = conn.execute('SELECT COUNT(*) FROM temp.inventory_import').fetchone()
+    changed, report.added = conn.execute('SELECT COUNT(*), COALESCE(SUM(added), 0) FROM temp.inventory_diff').fetchone()
+    report.updated = changed - report.added
+    report.unchanged = staged - changed
+    report.newly_low = [r[0] for r in conn.execute('''SELECT name FROM temp.inventory_diff
+                                                       WHERE stock < min_limit AND NOT COALESCE(old_stock < old_min_limit, 0)''')]
+    report.phases['diff'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    import_id = begin_import(conn, source)
+    ref = f'import:{import_id}'
+    missing = 'NOT EXISTS (SELECT 1 FROM temp.inventory_import n WHERE n.name = inventory.name)'
+    conn.execute('''INSERT INTO stock_movements (item_name, delta, stock_after, reason, ref)
+                    SELECT name, stock - COALESCE(old_stock, 0), stock, 'import', ? FROM temp.inventory_diff
+                    WHERE stock IS NOT old_stock''', (ref,))
+    conn.execute(f'''INSERT INTO stock_movements (item_name, delta, stock_after, reason, ref)
+                     SELECT name, -COALESCE(stock, 0), 0, 'removed', ? FROM inventory
+                     WHERE name IS NOT NULL AND {missing}''', (ref,))
+    report.removed = conn.execute(f'DELETE FROM inventory WHERE {missing}').rowcount
+    conn.execute(f'''UPDATE inventory SET {', '.join(f'{col} = d.{col}' for col in INVENTORY_TYPES if col != 'name')}
+                     FROM temp.inventory_diff d WHERE inventory.name = d.name AND NOT d.added''')
+    with bulk_insert(conn):
+        conn.execute(f'''INSERT INTO inventory ({_INVENTORY_COLUMNS})
+                         SELECT {_INVENTORY_COLUMNS} FROM temp.inventory_diff WHERE added''')
+    conn.execute('DELETE FROM temp.inventory_import')
+    conn.execute('DROP TABLE temp.inventory_diff')
+    report.phases['apply'] = time.perf_counter() - mark
+    report.elapsed = time.perf_counter() - started
+    finish_import(conn, import_id, report)
+    return report
+
+def sync_suppliers(conn, f, batch_size=BATCH_SIZE):
+    """Diff-imports a full supplier file: rows are matched on (item, name, email) as a whole."""
+    report = SyncReport('suppliers')
+    started = time.perf_counter()
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS supplier_import (item_name TEXT, name TEXT, email TEXT)')
+    conn.execute('CREATE INDEX IF NOT EXISTS temp.idx_supplier_import_item ON supplier_import(item_name)')
+    conn.execute('DELETE FROM temp.supplier_import')
+    import_rows(conn, 'suppliers', f, SUPPLIER_HEADERS, SUPPLIER_TYPES, ('item_name', 'name'), batch_size,
+                into='temp.supplier_import', report=report)
+    report.phases['parse'] = time.perf_counter() - started
+    if report.inserted:
+        mark = time.perf_counter()
+        same = lambda a, b: f'{a}.item_name IS {b}.item_name AND {a}.name IS {b}.name AND {a}.email IS {b}.email'
+        report.removed = conn.execute(f'''DELETE FROM suppliers WHERE NOT EXISTS
+                                          (SELECT 1 FROM temp.supplier_import n WHERE {same('n', 'suppliers')})''').rowcount
+        report.added = conn.execute(f'''INSERT INTO suppliers (item_name, name, email)
+                                        SELECT DISTINCT item_name, name, email FROM temp.supplier_import n
+                                        WHERE NOT EXISTS (SELECT 1 FROM suppliers s WHERE {same('s', 'n')})''').rowcount
+        staged, = conn.execute('SELECT COUNT(*) FROM (SELECT DISTINCT * FROM temp.supplier_import)').fetchone()
+        report.unchanged = staged - report.added
+        conn.execute('DELETE FROM temp.supplier_import')
+        report.phases['apply'] = time.perf_counter() - mark
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,150 @@
+"""SQLite engine: one long-lived, tuned connection per thread.
+
+Every thread (request handler, draft/ingest workers, watcher, scheduler)
+reuses its own connection instead of reconnecting per call, so pragmas are
+applied once and sqlite3's per-connection statement cache keeps prepared
+statements warm across requests. The database runs in WAL mode: readers
+never block the single writer, and `busy_timeout` lets writers queue
+instead of failing with "database is locked".
+
+Use it through the context manager, which commits on success and rolls
+back on error. Nested `with engine.connect()` blocks on the same thread
+share one transaction; only the outermost block commits.
+
+    with engine.connect() as conn:
+        conn.execute(...)
+
+A block that reads tables and then writes them should use
+`connect(write=True)`: it takes the write lock up front (BEGIN IMMEDIATE,
+which waits out `busy_timeout`). Otherwise the transaction begins as a
+reader, and if another connection commits before its first write, that
+write fails at once with "database is locked" (SQLITE_BUSY_SNAPSHOT), which
+`busy_timeout` cannot retry.
+
+Connections must not cross a fork: a forked child (e.g. a gunicorn --preload
+worker) calls `after_fork()` before touching the database.
+
+Set `on_query(verb, seconds)` to time every `conn.execute`/`executemany`
+(until the first row is ready; rows fetched later are not included).
+"""
+import sqlite3, threading, time, weakref
+from contextlib import contextmanager
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL', # durable across app crashes; WAL + NORMAL only risks the last commit on power loss
+    'cache_size': -32000, # KiB, i.e. ~32 MB page cache per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 10000, # ms
+    'temp_store': 'MEMORY',
+}
+
+
+class _Connection(sqlite3.Connection):
+    """Subclass so the engine can track connections with weak references (and time statements)."""
+    on_query = None
+
+    def execute(self, sql, *args):
+        if self.on_query is None:
+            return super().execute(sql, *args)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            self.on_query(sql.split(None, 1)[0].upper(), time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        if self.on_query is None:
+            return super().executemany(sql, *args)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            self.on_query(sql.split(None, 1)[0].upper(), time.perf_counter() - started)
+
+
+class DBEngine:
+    def __init__(self, path, pragmas=None, cached_statements=256, on_query=None):
+        self.path = path
+        self.on_query = on_query
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def configure(self, path=None, **pragmas):
+        """Points the engine at another file (or new pragmas); existing thread connections are retired."""
+        with self._lock:
+            if path:
+                self.path = path
+            self.pragmas.update(pragmas)
+            self._generation += 1
+        self.close_all()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.pragmas['busy_timeout'] / 1000,
+                               cached_statements=self.cached_statements, check_same_thread=False,
+                               factory=_Connection)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        conn.on_query = self.on_query
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def connection(self):
+        """This thread's pooled connection (opened on first use)."""
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation or local.conn is None:
+            local.conn = self._open()
+            local.generation = self._generation
+            local.depth = 0
+        return local.conn
+
+    @contextmanager
+    def connect(self, write=False):
+        """`write=True` starts the transaction with BEGIN IMMEDIATE, for blocks that read and then write."""
+        conn = self.connection()
+        local = self._local
+        if write and local.depth == 0 and not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            local.depth -= 1
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            local.depth -= 1
+            if local.depth == 0 and conn.in_transaction:
+                conn.commit()
+
+    def after_fork(self):
+        """In a forked child: forget the parent's connections without closing them (closing would touch
+        its locks and WAL state); threads here open their own on first use."""
+        self._lock = threading.Lock()
+        self._inherited = list(self._connections) # kept referenced, so they are never closed in this process
+        self._connections = weakref.WeakSet()
+        self._local = threading.local()
+        self._generation += 1
+
+    def close_thread(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
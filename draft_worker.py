@@ -0,0 +1,109 @@
+"""Bounded-concurrency pool that generates negotiation drafts in the background.
+
+`upload_all` inserts negotiations as DRAFT_PENDING and hands them to the pool;
+each worker asks the agent for a draft and passes it to `save_draft(neg_id,
+draft)`. Rate-limit responses (HTTP 429) pause *all* workers until the
+provider's retry-after / exponential backoff window has passed, so a burst of
+jobs does not hammer the API. Anything else, or running out of retries, falls
+back to the agent's template draft.
+
+With `claim(neg_id)`, a worker asks for the job right as it starts it (the
+callback renews the row's lease); if another process has taken the row over
+meanwhile, it returns False and the job is dropped rather than drafted twice.
+"""
+import random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def is_rate_limited(exc):
+    return getattr(exc, 'status_code', None) == 429 or type(exc).__name__ == 'RateLimitError'
+
+def retry_after(exc):
+    """Seconds the provider asked us to wait, if it said so."""
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class DraftWorkerPool:
+    def __init__(self, agent, save_draft, max_workers=4, max_retries=5, base_delay=1.0, max_delay=30.0, claim=None):
+        self.agent = agent
+        self.save_draft = save_draft
+        self.claim = claim
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='draft-worker')
+        self._lock = threading.Lock()
+        self._resume_at = 0.0 # monotonic time before which no worker may call the API
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self.stats = {'completed': 0, 'fallbacks': 0, 'rate_limited': 0, 'skipped': 0}
+
+    def submit(self, neg_id, item_name, current_stock, threshold, supplier_name, units=500, price=None):
+        with self._lock:
+            self._pending += 1
+        kwargs = dict(item_name=item_name, current_stock=current_stock, threshold=threshold,
+                      supplier_name=supplier_name, units=units, price=price)
+        return self._executor.submit(self._run, neg_id, kwargs)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def wait(self, timeout=None):
+        """Blocks until every submitted draft has been saved. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _backoff(self, exc, attempt):
+        delay = retry_after(exc) or min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay *= random.uniform(1.0, 1.25) # jitter so workers don't resume in lockstep
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            self.stats['rate_limited'] += 1
+
+    def _wait_for_window(self):
+        while True:
+            with self._lock:
+                remaining = self._resume_at - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _generate(self, kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_window()
+            try:
+                return self.agent.request_draft(**kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    print(f"Draft Error ({kwargs['item_name']}): {e}")
+                    break
+                self._backoff(e, attempt)
+        with self._lock:
+            self.stats['fallbacks'] += 1
+        return self.agent.fallback_draft(**kwargs)
+
+    def _run(self, neg_id, kwargs):
+        try:
+            if self.claim and not self.claim(neg_id):
+                with self._lock:
+                    self.stats['skipped'] += 1
+                return
+            self.save_draft(neg_id, self._generate(kwargs))
+            with self._lock:
+                self.stats['completed'] += 1
+        except Exception as e:
+            print(f"Draft Save Error (negotiation {neg_id}): {e}")
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
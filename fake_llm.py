@@ -0,0 +1,111 @@
+"""Local stand-in for the Groq client, for benchmarks and offline runs.
+
+Mimics the slice of the SDK the app uses — `client.chat.completions.create(...)`
+returning an object with `.choices[0].message.content`, or with `stream=True`
+an iterator of chunks carrying `.choices[0].delta.content` — with injectable
+latency, periodic HTTP 429 rate-limit errors, a random error rate, and canned
+replies picked by matching the prompt (see `load_replies`).
+"""
+import json, random, re, threading, time
+from types import SimpleNamespace
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Rate limit reached (fake)")
+        self.response = SimpleNamespace(headers={'retry-after': str(retry_after)} if retry_after else {})
+
+
+class FakeAPIError(Exception):
+    status_code = 503
+
+    def __init__(self):
+        super().__init__("Service unavailable (fake)")
+
+
+def load_replies(path):
+    """Reads canned replies from a JSON object mapping prompt regex -> reply (objects are sent as JSON text)."""
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    return [(re.compile(pattern), reply if isinstance(reply, str) else json.dumps(reply))
+            for pattern, reply in rules.items()]
+
+def _default_reply(model, messages, **params):
+    prompt = messages[-1]['content']
+    if 'one line per message' in prompt:
+        numbers = re.findall(r'^\s*(\d+)\. ', prompt, re.M)
+        return "\n".join(f"{n}: YES" for n in numbers)
+    if params.get('response_format', {}).get('type') == 'json_object':
+        return ('{"summary": "Customer asked about pricing.", "sentiment": "Neutral", '
+                '"revenue_potential": 0, "leads": [], "urgent_tasks": []}')
+    if params.get('max_tokens', 0) and params['max_tokens'] <= 5:
+        return "YES"
+    return f"Subject: Restock Request\n\n(fake draft for a {len(prompt)}-char prompt)"
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model, messages, **params):
+        return self._owner._complete(model, messages, **params)
+
+
+class FakeLLMClient:
+    """`latency` seconds to the first token (+ up to `jitter`, + `prompt_latency` per 1k prompt tokens),
+    then `token_latency` per generated word; every `rate_limit_every`-th call raises a 429 and a random
+    `error_rate` of calls raise a 503. `replies` is a list of (regex, text): the first pattern found in
+    the prompt supplies the reply, otherwise `reply(model, messages, **params)` does."""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_every=0, retry_after=None, reply=_default_reply, seed=None,
+                 prompt_latency=0.0, token_latency=0.0, error_rate=0.0, replies=()):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.replies = list(replies)
+        self.prompt_latency = prompt_latency
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.reply = reply
+        self.calls = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def _complete(self, model, messages, cache_site=None, use_cache=True, stream=False, **params):
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            delay += self.prompt_latency * sum(len(m['content']) for m in messages) / 4000 # ~4 chars per token
+            failed = self.error_rate and self._random.random() < self.error_rate
+        try:
+            time.sleep(delay)
+            if self.rate_limit_every and call_no % self.rate_limit_every == 0:
+                raise FakeRateLimitError(self.retry_after)
+            if failed:
+                raise FakeAPIError()
+            prompt = messages[-1]['content']
+            content = next((text for pattern, text in self.replies if pattern.search(prompt)), None)
+            if content is None:
+                content = self.reply(model, messages, **params)
+            if stream:
+                return self._stream(content)
+            time.sleep(self.token_latency * len(re.findall(r'\S+\s*', content)))
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _stream(self, content):
+        for n, piece in enumerate(re.findall(r'\s*\S+\s*', content)):
+            if n:
+                time.sleep(self.token_latency)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
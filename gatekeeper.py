@@ -0,0 +1,156 @@
+"""Batched gatekeeper: decides which WhatsApp messages are worth a full analysis.
+
+Two stages:
+  1. `prefilter` — local heuristics (greeting/noise vocabulary, business keyword
+     scoring). Obvious noise and obvious business messages never reach the LLM;
+     short messages outside the noise vocabulary ("Kapda bekar hai") still do.
+  2. `BatchGatekeeper` — the remaining "unsure" messages are sent many at a time
+     in one prompt and the per-message YES/NO verdicts are parsed back.
+     `classify()` micro-batches concurrent single-message callers (webhook
+     requests) over a short window; `classify_many()` is for callers that
+     already hold a batch (queue workers, chat exports).
+
+If the LLM call fails, or a verdict is missing from the reply, the message is
+treated as relevant — same fail-open behaviour as the old per-message check.
+"""
+import json, re, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+NOISE_WORDS = {
+    'hi', 'hii', 'hello', 'hey', 'hola', 'namaste', 'good', 'morning', 'gm', 'afternoon', 'evening', 'night', 'gn',
+    'ok', 'okay', 'okk', 'k', 'kk', 'thanks', 'thank', 'you', 'thx', 'ty', 'welcome', 'bye', 'see', 'ya', 'lol',
+    'haha', 'hahaha', 'lmao', 'yes', 'no', 'yeah', 'yup', 'nope', 'sure', 'fine', 'cool', 'nice', 'great', 'bhai',
+    'ji', 'sir', 'madam', 'all', 'everyone', 'guys', 'team', 'have', 'a', 'day', 'happy', 'sunday', 'monday',
+    'tomorrow', 'today', 'true',
+    'media', 'omitted', 'this', 'message', 'was', 'deleted', 'forwarded', 'sticker', 'image', 'gif',
+}
+BUSINESS_WORDS = {
+    'price', 'prices', 'rate', 'rates', 'cost', 'quote', 'quotation', 'order', 'orders', 'ordered', 'buy', 'purchase',
+    'deliver', 'delivery', 'dispatch', 'ship', 'shipment', 'stock', 'available', 'availability', 'invoice', 'bill',
+    'payment', 'paid', 'pay', 'refund', 'return', 'replace', 'replacement', 'complaint', 'defect', 'defective',
+    'damaged', 'torn', 'broken', 'late', 'delay', 'urgent', 'asap', 'bulk', 'wholesale', 'supply', 'supplier',
+    'catalogue', 'catalog', 'sample', 'samples', 'discount', 'offer', 'units', 'pcs', 'pieces', 'metres', 'meters',
+    'kg', 'dozen', 'rs', 'inr', 'gst', 'lead', 'customer', 'feedback', 'quality', 'size', 'colour', 'color',
+}
+_WORD = re.compile(r"[a-z]+|\d+")
+_AMOUNT = re.compile(r"(₹|rs\.?\s*\d|inr\s*\d|\d+\s*(pcs|units|kg|m|metres|meters|dozen|rolls|boxes)\b)", re.I)
+_VERDICT = re.compile(r"^\s*\**\s*(\d+)\s*[:.)\-]\s*\**\s*(YES|NO)\b", re.I | re.M)
+
+MAX_MESSAGE_CHARS = 500
+
+
+def prefilter(text):
+    """True = clearly business, False = clearly noise, None = let the LLM decide."""
+    words = _WORD.findall((text or '').lower())
+    if not words:
+        return False # empty, emoji-only, punctuation
+    if all(w in NOISE_WORDS for w in words):
+        return False
+    score = sum(w in BUSINESS_WORDS for w in words) + (2 if _AMOUNT.search(text) else 0)
+    if score >= 2:
+        return True
+    return None
+
+
+def batch_prompt(texts):
+    lines = "\n".join(f"{n}. {json.dumps(t[:MAX_MESSAGE_CHARS], ensure_ascii=False)}" for n, t in enumerate(texts, 1))
+    return f"""
+    Classify each WhatsApp message below. A message is business relevant (YES) if it contains:
+    - Customer feedback (positive or negative)
+    - Product/Price queries
+    - New sales leads
+    - Urgent complaints or requests
+    Greetings like 'Hi' or 'Good morning', general chatter and noise are NO.
+
+    Reply with exactly one line per message in the form "<number>: YES" or "<number>: NO" and nothing else.
+
+    Messages:
+    {lines}
+    """
+
+def parse_verdicts(reply, count):
+    """Per-message verdicts from the LLM reply; missing/garbled entries default to relevant."""
+    verdicts = [True] * count
+    for number, answer in _VERDICT.findall(reply or ''):
+        idx = int(number) - 1
+        if 0 <= idx < count:
+            verdicts[idx] = answer.upper() == 'YES'
+    return verdicts
+
+
+class BatchGatekeeper:
+    def __init__(self, llm, max_batch=20, max_wait=0.05, llm_workers=2):
+        self.llm = llm # an llm_provider.LLMProvider
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = [] # (text, Future) waiting for the next batch
+        self._cond = threading.Condition()
+        self._flusher = None
+        self._executor = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix='gatekeeper')
+        self._stats_lock = threading.Lock()
+        self.stats = {'messages': 0, 'prefiltered_noise': 0, 'prefiltered_business': 0,
+                      'llm_calls': 0, 'llm_messages': 0, 'llm_seconds': 0.0, 'fallbacks': 0}
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def _ask_llm(self, texts):
+        started = time.perf_counter()
+        try:
+            reply = self.llm.complete("is_business_relevant", batch_prompt(texts), max_tokens=8 * len(texts) + 8)
+            verdicts = parse_verdicts(reply, len(texts))
+        except Exception as e:
+            print(f"Gatekeeper Error: {e}")
+            self._count(fallbacks=1)
+            verdicts = [True] * len(texts) # Fallback to processing if API fails
+        self._count(llm_calls=1, llm_messages=len(texts), llm_seconds=time.perf_counter() - started)
+        return verdicts
+
+    def _prefilter(self, texts):
+        verdicts = [prefilter(t) for t in texts]
+        self._count(messages=len(texts),
+                    prefiltered_noise=sum(v is False for v in verdicts),
+                    prefiltered_business=sum(v is True for v in verdicts))
+        return verdicts
+
+    def classify_many(self, texts):
+        verdicts = self._prefilter(texts)
+        unsure = [i for i, v in enumerate(verdicts) if v is None]
+        for start in range(0, len(unsure), self.max_batch):
+            chunk = unsure[start:start + self.max_batch]
+            for i, v in zip(chunk, self._ask_llm([texts[i] for i in chunk])):
+                verdicts[i] = v
+        return verdicts
+
+    def classify(self, text):
+        verdict = self._prefilter([text])[0]
+        if verdict is not None:
+            return verdict
+        future = Future()
+        with self._cond:
+            self._queue.append((text, future))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='gatekeeper-flusher', daemon=True)
+                self._flusher.start()
+            self._cond.notify()
+        return future.result()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            self._executor.submit(self._resolve, batch)
+
+    def _resolve(self, batch):
+        for (_, future), verdict in zip(batch, self._ask_llm([text for text, _ in batch])):
+            future.set_result(verdict)
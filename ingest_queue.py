@@ -0,0 +1,152 @@
+"""Durable SQLite-backed queue between /webhook/whatsapp and the WhatsApp agent.
+
+The webhook only INSERTs the message and acknowledges; `IngestWorkerPool`
+threads claim batches, run the (batched) gatekeeper + analysis, and mark
+each row done/ignored. Failures are retried with exponential backoff and
+dead-lettered after `max_attempts`. `provider_msg_id` is UNIQUE, so provider
+retries of the same message are acknowledged without being enqueued twice.
+
+Row states: pending -> processing -> done | ignored, or back to pending on
+failure until it becomes dead. Rows stuck in processing longer than
+`visibility_timeout` (crashed worker) are handed out again. Finished rows
+are kept for a while so provider retries are still recognised, then `prune`d.
+"""
+import threading, time, uuid
+
+
+def init_ingest_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS ingest_queue
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, provider_msg_id TEXT UNIQUE, source TEXT,
+                  body TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+                  available_at REAL NOT NULL, locked_by TEXT, locked_at REAL, last_error TEXT,
+                  created_at REAL NOT NULL, processed_at REAL)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ingest_queue_ready ON ingest_queue(status, available_at)')
+
+
+class IngestQueue:
+    """`connect()` must return a context manager yielding a connection that commits on exit."""
+
+    def __init__(self, connect, max_attempts=5, base_delay=2.0, max_delay=300.0, visibility_timeout=300.0):
+        self.connect = connect
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.visibility_timeout = visibility_timeout
+        self.wakeup = threading.Event() # set on enqueue so idle workers don't wait a full poll interval
+
+    def _run(self, sql, params=()):
+        with self.connect() as conn:
+            cur = conn.execute(sql, params)
+            rows = cur.fetchall()
+            return cur.rowcount, rows
+
+    def enqueue(self, provider_msg_id, body, source=None):
+        """Returns True if queued, False if this provider message id was already seen."""
+        now = time.time()
+        inserted, _ = self._run('''INSERT OR IGNORE INTO ingest_queue
+                                   (provider_msg_id, source, body, available_at, created_at) VALUES (?, ?, ?, ?, ?)''',
+                                (provider_msg_id, source, body, now, now))
+        if inserted:
+            self.wakeup.set()
+        return bool(inserted)
+
+    def claim(self, limit, worker_id):
+        now = time.time()
+        _, rows = self._run('''UPDATE ingest_queue SET status='processing', locked_by=?, locked_at=?, attempts=attempts+1
+                               WHERE id IN (SELECT id FROM ingest_queue
+                                            WHERE (status='pending' AND available_at <= ?)
+                                               OR (status='processing' AND locked_at < ?)
+                                            ORDER BY id LIMIT ?)
+                               RETURNING id, provider_msg_id, body, attempts''',
+                            (worker_id, now, now, now - self.visibility_timeout, limit))
+        return sorted(rows, key=lambda r: r[0])
+
+    def complete(self, msg_id, status='done'):
+        self._run('''UPDATE ingest_queue SET status=?, processed_at=?, locked_by=NULL, last_error=NULL
+                     WHERE id=?''', (status, time.time(), msg_id))
+
+    def fail(self, msg_id, attempts, error):
+        if attempts >= self.max_attempts:
+            self._run('''UPDATE ingest_queue SET status='dead', processed_at=?, locked_by=NULL, last_error=?
+                         WHERE id=?''', (time.time(), str(error), msg_id))
+            return 'dead'
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        self._run('''UPDATE ingest_queue SET status='pending', available_at=?, locked_by=NULL, last_error=?
+                     WHERE id=?''', (time.time() + delay, str(error), msg_id))
+        return 'retry'
+
+    def requeue_dead(self):
+        """Gives every dead-lettered message a fresh set of attempts."""
+        count, _ = self._run('''UPDATE ingest_queue SET status='pending', attempts=0, available_at=?
+                                WHERE status='dead' ''', (time.time(),))
+        if count:
+            self.wakeup.set()
+        return count
+
+    def prune(self, keep_days):
+        """Deletes done, ignored and dead rows finished more than `keep_days` ago; returns how many."""
+        count, _ = self._run('''DELETE FROM ingest_queue WHERE status IN ('done', 'ignored', 'dead')
+                                AND processed_at < ?''', (time.time() - keep_days * 86400,))
+        return count
+
+    def depth(self):
+        _, rows = self._run('SELECT status, COUNT(*) FROM ingest_queue GROUP BY status')
+        return {'pending': 0, 'processing': 0, 'done': 0, 'ignored': 0, 'dead': 0, **dict(rows)}
+
+
+class IngestWorkerPool:
+    """`handler(rows)` returns one outcome per row: 'done', 'ignored', or an Exception/str error to retry."""
+
+    def __init__(self, queue, handler, workers=2, batch_size=20, poll_interval=1.0):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return self
+        for n in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(f"ingest-{uuid.uuid4().hex[:6]}-{n}",),
+                                 name=f'ingest-worker-{n}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"📨 Ingest queue workers started ({self.workers} x batch {self.batch_size}).")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self.queue.wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def drain_once(self, worker_id='inline'):
+        """Claims and processes one batch; returns how many rows it handled."""
+        rows = self.queue.claim(self.batch_size, worker_id)
+        if not rows:
+            return 0
+        try:
+            outcomes = self.handler(rows)
+        except Exception as e:
+            outcomes = [e] * len(rows)
+        for (msg_id, _, _, attempts), outcome in zip(rows, outcomes):
+            if outcome in ('done', 'ignored'):
+                self.queue.complete(msg_id, outcome)
+            elif self.queue.fail(msg_id, attempts, outcome) == 'dead':
+                print(f"☠️ Ingest message {msg_id} dead-lettered after {attempts} attempts: {outcome}")
+        return len(rows)
+
+    def _loop(self, worker_id):
+        while not self._stop.is_set():
+            try:
+                if self.drain_once(worker_id):
+                    continue
+            except Exception as e:
+                print(f"Ingest Worker Error: {e}")
+            self.queue.wakeup.wait(self.poll_interval)
+            self.queue.wakeup.clear()
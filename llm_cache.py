@@ -0,0 +1,185 @@
+"""Persistent response cache for LLM chat completions.
+
+Entries are keyed on (model, whitespace-normalized messages, call params) and
+stored in a small SQLite file, expiring after `ttl` seconds and evicted
+least-recently-used once more than `max_entries` are stored.
+
+`CachedLLMClient` wraps a Groq-compatible client and keeps its
+`client.chat.completions.create(...)` call shape, plus two extra keyword
+arguments: `cache_site` names the call site (for stats and for the
+`bypass` list) and `use_cache=False` skips the cache for one call. With
+`forward_site=True` the site is passed on to the wrapped client, for a layer
+underneath that labels by it (metrics.InstrumentedLLMClient); the raw Groq
+client would reject it.
+
+Streaming calls (`stream=True`) share entries with blocking ones: a hit is
+replayed as a single chunk, and a miss is cached once the stream has been
+read to the end.
+"""
+import hashlib, json, sqlite3, threading, time
+from types import SimpleNamespace
+
+
+def normalize_prompt(text):
+    return " ".join(str(text).split())
+
+def cache_key(model, messages, params):
+    payload = {
+        'model': model,
+        'messages': [(m.get('role'), normalize_prompt(m.get('content', ''))) for m in messages],
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path, ttl=86400, max_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = None # opened on first use, so importing the app (and forking workers) opens no file
+        self._size = 0
+        self._stats = {}
+
+    @property
+    def _conn(self):
+        """The cache connection, opened on first use. Callers hold `_lock`."""
+        if self._db is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('''CREATE TABLE IF NOT EXISTS llm_cache
+                         (key TEXT PRIMARY KEY, site TEXT, content TEXT NOT NULL, latency REAL,
+                          created_at REAL NOT NULL, last_access REAL NOT NULL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)')
+            conn.commit()
+            self._size = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+            self._db = conn
+        return self._db
+
+    def after_fork(self):
+        """In a forked child: drop the parent's connection (unclosed, it stays the parent's) and reopen lazily."""
+        self._lock = threading.Lock()
+        self._inherited, self._db = self._db, None
+
+    def _site(self, site):
+        return self._stats.setdefault(site or 'default',
+                                      {'hits': 0, 'misses': 0, 'bypassed': 0, 'latency_saved': 0.0})
+
+    def get(self, key, site=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT content, latency, created_at FROM llm_cache WHERE key=?',
+                                     (key,)).fetchone()
+            stats = self._site(site)
+            if row and now - row[2] <= self.ttl:
+                self._conn.execute('UPDATE llm_cache SET last_access=? WHERE key=?', (now, key))
+                self._conn.commit()
+                stats['hits'] += 1
+                stats['latency_saved'] += row[1] or 0.0
+                return row[0]
+            if row: # expired
+                self._conn.execute('DELETE FROM llm_cache WHERE key=?', (key,))
+                self._conn.commit()
+                self._size -= 1
+            stats['misses'] += 1
+            return None
+
+    def put(self, key, content, latency=None, site=None):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute('SELECT 1 FROM llm_cache WHERE key=?', (key,)).fetchone()
+            self._conn.execute('''INSERT OR REPLACE INTO llm_cache (key, site, content, latency, created_at, last_access)
+                               VALUES (?, ?, ?, ?, ?, ?)''', (key, site, content, latency, now, now))
+            if not exists:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._size -= self._conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl,)).rowcount
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            self._size -= self._conn.execute('''DELETE FROM llm_cache WHERE key IN
+                                             (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)''',
+                                             (overflow,)).rowcount
+
+    def record_bypass(self, site=None):
+        with self._lock:
+            self._site(site)['bypassed'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache')
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            self._conn # entries are counted when the file is opened
+            sites = {name: dict(s) for name, s in self._stats.items()}
+        totals = {k: sum(s[k] for s in sites.values()) for k in ('hits', 'misses', 'bypassed', 'latency_saved')}
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        return {'entries': self._size, 'max_entries': self.max_entries, 'ttl': self.ttl, **totals, 'sites': sites}
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+def iter_deltas(stream):
+    """Text pieces of a streamed completion, skipping empty/role-only chunks."""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+class _CachedCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model, messages, cache_site=None, use_cache=True, **params):
+        return self._owner._create(model, messages, cache_site, use_cache, **params)
+
+
+class CachedLLMClient:
+    def __init__(self, client, cache, bypass=(), forward_site=False):
+        self.client = client
+        self.cache = cache
+        self.bypass = set(bypass)
+        self.forward_site = forward_site
+        self.chat = SimpleNamespace(completions=_CachedCompletions(self))
+
+    def _create(self, model, messages, site, use_cache, **params):
+        forward = {'cache_site': site} if self.forward_site else {} # not part of the cache key
+        if not use_cache or site in self.bypass:
+            self.cache.record_bypass(site)
+            return self.client.chat.completions.create(model=model, messages=messages, **params, **forward)
+        stream = params.pop('stream', False)
+        key = cache_key(model, messages, params)
+        content = self.cache.get(key, site)
+        if content is not None:
+            return iter([_chunk(content)]) if stream else _completion(content)
+        started = time.perf_counter()
+        if stream:
+            return self._tee(key, site, started,
+                             self.client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                                **params, **forward))
+        completion = self.client.chat.completions.create(model=model, messages=messages, **params, **forward)
+        content = completion.choices[0].message.content
+        if content is not None:
+            self.cache.put(key, content, time.perf_counter() - started, site)
+        return completion
+
+    def _tee(self, key, site, started, stream):
+        """Passes chunks through and caches the full text if the stream completes."""
+        pieces = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+            yield chunk
+        if pieces:
+            self.cache.put(key, "".join(pieces), time.perf_counter() - started, site)
@@ -0,0 +1,74 @@
+"""Pluggable LLM backend for the agents.
+
+`make_client(backend)` builds the raw chat-completions client: `groq` (the
+hosted API, imported only when selected) or `fake` (fake_llm.FakeLLMClient,
+deterministic and offline, for local runs and the end-to-end benchmark).
+Either is wrapped by the cache and metrics layers as before.
+
+`LLMProvider` is what the agents call. It holds the wrapped client and the
+model name, and reduces a call site to `complete(site, messages)` -> text or
+`stream(site, messages)` -> text pieces, so the agents never touch the
+`client.chat.completions.create(...)` shape or the model name themselves.
+
+`LazyClient` defers building the backend until the first call, so importing
+the app (and forking web workers) never loads the Groq SDK.
+"""
+import threading
+
+from llm_cache import iter_deltas
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+BACKENDS = ('groq', 'fake')
+
+
+def make_client(backend='groq', api_key=None, **fake_options):
+    """The raw client for `backend`; `fake_options` go to FakeLLMClient and are ignored for groq."""
+    if backend == 'groq':
+        from groq import Groq
+        return Groq(api_key=api_key)
+    if backend == 'fake':
+        from fake_llm import FakeLLMClient
+        return FakeLLMClient(**fake_options)
+    raise ValueError(f"Unknown LLM backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+class LazyClient:
+    """Stands in for the client `factory()` returns, building it on first use (once, across threads)."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    @property
+    def chat(self):
+        return self.client.chat
+
+
+def _messages(prompt):
+    return [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+
+
+class LLMProvider:
+    def __init__(self, client, model=DEFAULT_MODEL):
+        self.client = client
+        self.model = model
+
+    def complete(self, site, prompt, **params):
+        """Reply text for `prompt` (a user message string or a messages list). Raises on API errors."""
+        completion = self.client.chat.completions.create(model=self.model, messages=_messages(prompt),
+                                                         cache_site=site, **params)
+        return completion.choices[0].message.content
+
+    def stream(self, site, prompt, **params):
+        """Yields the reply text as it is generated. Raises on API errors."""
+        yield from iter_deltas(self.client.chat.completions.create(model=self.model, messages=_messages(prompt),
+                                                                   cache_site=site, stream=True, **params))
@@ -0,0 +1,243 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+A small registry of counters, gauges and histograms (label values are
+passed as keyword arguments), plus collector callbacks that turn the stats
+the subsystems already keep — gatekeeper, draft pool, scheduler, caches,
+queues — into gauges at scrape time. `Registry.render()` is what `/metrics`
+serves; `serve(registry, port)` exposes it from a process without the web
+app (worker.py).
+
+`InstrumentedLLMClient` wraps the raw backend (anything with the
+`client.chat.completions.create(...)` shape) underneath the response cache,
+so only real API calls are timed, and records latency, token usage and
+errors per `cache_site`, which it takes off the call before passing it on.
+Streamed calls are timed to the first chunk and to the end.
+"""
+import bisect, re, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_NAME = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][slot] += 1
+            counts[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in sorted(self._values.items())]
+        out = []
+        for key, counts, total in values:
+            running = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                running += count
+                out.append((f'{self.name}_bucket', key, (('le', _number(bound)),), running))
+            out.append((f'{self.name}_sum', key, (), total))
+            out.append((f'{self.name}_count', key, (), running))
+        return out
+
+
+class Registry:
+    def __init__(self, prefix='msme_'):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        metric.name = self.prefix + metric.name
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        """Registers `fn()` -> {metric name: number or {(label, value) pairs: number}}, read at scrape time as gauges."""
+        self._collectors.append(fn)
+        return fn
+
+    def _collected(self):
+        families = {}
+        for fn in self._collectors:
+            try:
+                values = fn()
+            except Exception as e: # one broken source must not take the whole scrape down
+                print(f"Metrics Collector Error ({getattr(fn, '__name__', fn)}): {e}")
+                continue
+            for name, value in values.items():
+                series = value if isinstance(value, dict) else {(): value}
+                families.setdefault(self.prefix + _NAME.sub('_', name), []).extend(series.items())
+        return families
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += [f'# HELP {metric.name} {metric.help}', f'# TYPE {metric.name} {metric.kind}']
+            lines += [f'{name}{_labels(metric.label_names, key, extra)} {_number(value)}'
+                      for name, key, extra, value in metric.samples()]
+        for name, series in self._collected().items():
+            series = [(pairs, value) for pairs, value in series if isinstance(value, (int, float))]
+            if series:
+                lines.append(f'# TYPE {name} gauge')
+                lines += [f'{name}{_labels((), (), pairs)} {_number(value)}' for pairs, value in series]
+        return '\n'.join(lines) + '\n'
+
+
+def serve(registry, port, host='0.0.0.0'):
+    """Serves `registry.render()` at /metrics on a background thread; returns the server (call shutdown())."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args): # scrapes every few seconds would flood the worker log
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+class _InstrumentedCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, **params):
+        return self._owner._create(params)
+
+
+class InstrumentedLLMClient:
+    def __init__(self, client, registry):
+        self.client = client
+        self.chat = SimpleNamespace(completions=_InstrumentedCompletions(self))
+        self.latency = registry.histogram('llm_request_seconds', 'LLM call latency (streams: until the last chunk)',
+                                          ('site', 'stream'))
+        self.first_chunk = registry.histogram('llm_first_chunk_seconds', 'Time to the first streamed chunk', ('site',))
+        self.tokens = registry.histogram('llm_tokens', 'Tokens per LLM call, when the API reports usage',
+                                         ('site', 'kind'), TOKEN_BUCKETS)
+        self.errors = registry.counter('llm_errors_total', 'LLM calls that raised', ('site', 'error'))
+
+    def _usage(self, site, usage):
+        if usage is not None:
+            for kind in ('prompt_tokens', 'completion_tokens'):
+                if getattr(usage, kind, None) is not None:
+                    self.tokens.observe(getattr(usage, kind), site=site, kind=kind.split('_')[0])
+
+    def _create(self, params):
+        site = params.pop('cache_site', None) or 'unlabelled'
+        params.pop('use_cache', None)
+        started = time.perf_counter()
+        try:
+            result = self.client.chat.completions.create(**params)
+        except Exception as e:
+            self.errors.inc(site=site, error=type(e).__name__)
+            raise
+        if params.get('stream'):
+            return self._stream(site, started, result)
+        self.latency.observe(time.perf_counter() - started, site=site, stream='false')
+        self._usage(site, getattr(result, 'usage', None))
+        return result
+
+    def _stream(self, site, started, stream):
+        first = True
+        try:
+            for chunk in stream:
+                if first:
+                    self.first_chunk.observe(time.perf_counter() - started, site=site)
+                    first = False
+                # Groq reports usage on the final chunk under x_groq
+                self._usage(site, getattr(getattr(chunk, 'x_groq', None), 'usage', None) or getattr(chunk, 'usage', None))
+                yield chunk
+        except Exception as e:
+            self.errors.inc(site=site, error=type(e).__name__)
+            raise
+        self.latency.observe(time.perf_counter() - started, site=site, stream='true')
@@ -0,0 +1,94 @@
+"""Change feed for the negotiations table.
+
+Triggers append one row to `negotiation_events` whenever a negotiation is
+created, changes status/draft/reply/amount, or is deleted; the event `seq`
+is the feed cursor. `read_feed(conn, since)` returns only the negotiations
+touched after `since` (latest state, one entry per negotiation), so clients
+receive deltas instead of re-rendering the whole inventory page. A cursor
+older than the retained history (or none at all) gets a full snapshot with
+`reset: True`.
+
+`NegotiationFeed` lets any number of streaming clients wait for changes
+while a single thread polls `MAX(seq)`, which also picks up writes made by
+other processes.
+"""
+import threading, time
+
+FEED_COLUMNS = 'id, item_name, supplier_email, draft, invoice_amount, status, units, last_reply'
+
+
+def init_negotiation_feed(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS negotiation_events
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT, negotiation_id INTEGER NOT NULL, op TEXT NOT NULL,
+                  status TEXT, at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0))''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS negotiation_events_insert AFTER INSERT ON negotiations BEGIN
+                        INSERT INTO negotiation_events (negotiation_id, op, status) VALUES (new.id, 'upsert', new.status); END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS negotiation_events_update
+                    AFTER UPDATE OF status, draft, last_reply, units, invoice_amount ON negotiations BEGIN
+                        INSERT INTO negotiation_events (negotiation_id, op, status) VALUES (new.id, 'upsert', new.status); END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS negotiation_events_delete AFTER DELETE ON negotiations BEGIN
+                        INSERT INTO negotiation_events (negotiation_id, op, status) VALUES (old.id, 'delete', NULL); END''')
+
+def current_cursor(conn):
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM negotiation_events').fetchone()[0]
+
+def read_feed(conn, since=None, limit=500):
+    """{'cursor', 'reset', 'changes': [negotiation dicts], 'removed': [ids]} for everything after `since`."""
+    oldest, latest = conn.execute('SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM negotiation_events').fetchone()
+    if since is None or since > latest or (oldest is not None and since < oldest - 1):
+        rows = conn.execute(f'SELECT {FEED_COLUMNS} FROM negotiations ORDER BY id').fetchall()
+        return {'cursor': latest, 'reset': True, 'changes': [dict(r) for r in rows], 'removed': []}
+    touched = conn.execute('''SELECT negotiation_id, MAX(seq) FROM negotiation_events WHERE seq > ?
+                              GROUP BY negotiation_id ORDER BY MAX(seq) LIMIT ?''', (since, limit)).fetchall()
+    if not touched:
+        return {'cursor': since, 'reset': False, 'changes': [], 'removed': []}
+    ids = [r[0] for r in touched]
+    rows = conn.execute(f'SELECT {FEED_COLUMNS} FROM negotiations WHERE id IN ({", ".join("?" * len(ids))})',
+                        ids).fetchall()
+    present = {r['id'] for r in rows}
+    # With `limit` hit, the cursor stops at the last returned change; the rest follow on the next read
+    return {'cursor': touched[-1][1], 'reset': False, 'changes': [dict(r) for r in rows],
+            'removed': [i for i in ids if i not in present]}
+
+def prune_events(conn, keep=10000):
+    """Drops all but the newest `keep` events; clients further behind get a snapshot instead."""
+    return conn.execute('''DELETE FROM negotiation_events
+                           WHERE seq <= (SELECT MAX(seq) FROM negotiation_events) - ?''', (keep,)).rowcount
+
+
+class NegotiationFeed:
+    """`connect()` must return a context manager yielding a connection that commits on exit."""
+
+    def __init__(self, connect, poll_interval=1.0, keep=10000, prune_interval=300.0):
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self.prune_interval = prune_interval
+        self.latest = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _poll(self):
+        next_prune = time.monotonic() + self.prune_interval
+        while True:
+            try:
+                with self.connect() as conn:
+                    latest = current_cursor(conn)
+                    if time.monotonic() >= next_prune:
+                        prune_events(conn, self.keep)
+                        next_prune = time.monotonic() + self.prune_interval
+                with self._cond:
+                    if latest != self.latest:
+                        self.latest = latest
+                        self._cond.notify_all()
+            except Exception as e:
+                print(f"Negotiation Feed Error: {e}")
+            time.sleep(self.poll_interval)
+
+    def wait(self, cursor, timeout):
+        """Blocks until the feed moves past `cursor`; False on timeout."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name='negotiation-feed', daemon=True)
+                self._thread.start()
+            return self._cond.wait_for(lambda: self.latest is not None and self.latest != cursor, timeout)
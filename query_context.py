@@ -0,0 +1,145 @@
+"""Bounded data context for /ai-query.
+
+Instead of pasting every inventory row and insight into the prompt, the
+question is matched against SQLite FTS5 indexes over item names and insight
+summaries, and only the best-ranked (bm25) rows are included. Totals and
+counts come from the precomputed `kpi_summary` row, so aggregate questions
+("total stock value?", "how many items are low?") never need the raw rows.
+Everything is added in priority order until `token_budget` is used up.
+
+The FTS tables are external-content indexes kept in sync by triggers; on a
+SQLite build without FTS5 retrieval is skipped and only totals, low-stock
+and top-value rows are sent.
+"""
+import re, sqlite3
+
+from csv_importer import ROW_BY_ROW
+
+_TERM = re.compile(r"[^\W_]+")
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'do', 'does', 'did', 'have', 'has', 'had', 'i', 'we', 'my',
+    'our', 'me', 'you', 'it', 'its', 'of', 'in', 'on', 'for', 'to', 'from', 'by', 'with', 'at', 'and', 'or', 'any',
+    'what', 'which', 'who', 'how', 'many', 'much', 'when', 'where', 'why', 'show', 'list', 'tell', 'give', 'all',
+    'there', 'this', 'that', 'these', 'those', 'about', 'can', 'should', 'will', 'please', 'us', 'some', 'left',
+    'item', 'items', 'stock', 'units', 'current', 'currently', 'now', 'today',
+}
+LOW_STOCK_HINT = re.compile(r"\b(low|short|shortage|reorder|restock|refill|running out|out of stock|below|minimum)\b", re.I)
+INSIGHT_HINT = re.compile(r"\b(customer|customers|feedback|complain\w*|whatsapp|chat|insight\w*|lead\w*|sentiment|"
+                          r"positive|negative|neutral|revenue|happy|angry)\b", re.I)
+
+FTS_TABLES = (('inventory', 'inventory_fts', 'name'), ('whatsapp_insights', 'insights_fts', 'summary'))
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English/Hinglish text)."""
+    return len(text) // 4 + 1
+
+
+def init_search_index(conn):
+    """Creates the FTS5 indexes and sync triggers, backfilling existing rows. False if FTS5 is unavailable."""
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, fts, column in FTS_TABLES:
+        try:
+            conn.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{table}',
+                             content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')''')
+        except sqlite3.OperationalError: # sqlite built without FTS5
+            return False
+        # Bulk inventory loads (csv_importer.bulk_insert) index their rows in one statement at the end
+        when = f'WHEN {ROW_BY_ROW}' if table == 'inventory' else ''
+        conn.execute(f'DROP TRIGGER IF EXISTS {fts}_insert')
+        conn.execute(f'''CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} {when} BEGIN
+                             INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column}); END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                             INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+                             INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                             INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column}); END''')
+        if fts not in existing:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_fts_bulk AFTER UPDATE OF active ON inventory_bulk
+                    WHEN old.active AND NOT new.active BEGIN
+                        INSERT INTO inventory_fts (rowid, name) SELECT id, name FROM inventory WHERE id > old.after_id; END''')
+    return True
+
+
+def match_query(question):
+    """FTS5 query OR-ing the question's meaningful words as prefixes; '' if nothing is searchable."""
+    terms = [t for t in _TERM.findall(question.lower()) if len(t) > 1 and t not in STOPWORDS]
+    return " OR ".join(f'"{t}"*' for t in dict.fromkeys(terms))
+
+
+def item_line(row):
+    return f"- {row['name']}: {row['stock']} units, Cost: ₹{row['cost']}, Reorder level: {row['min_limit']}"
+
+def insight_line(row):
+    return f"- {row['summary']} (Sentiment: {row['sentiment']}, Potential: ₹{row['revenue']})"
+
+def totals_lines(kpis):
+    return [
+        f"- Items in inventory: {kpis['total_items']}",
+        f"- Total inventory value: ₹{kpis['total_value']:,.2f}",
+        f"- Items below reorder level: {kpis['low_stock']}",
+        f"- WhatsApp insights: {kpis['positive']} positive, {kpis['neutral']} neutral, {kpis['negative']} negative",
+        f"- Potential revenue from insights: ₹{kpis['potential_revenue']:,.2f}",
+    ]
+
+
+class ContextBuilder:
+    def __init__(self, token_budget=1500, top_k=20):
+        self.token_budget = token_budget
+        self.top_k = top_k
+
+    def _search(self, conn, sql, params):
+        try:
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError: # no FTS5, index not created yet, or an unparsable query
+            return []
+
+    def _sections(self, conn, question, kpis):
+        """(title, lines) in priority order; later sections are dropped first when the budget runs out."""
+        yield "Totals (precomputed over ALL data)", totals_lines(kpis)
+        query, k = match_query(question), self.top_k
+        if LOW_STOCK_HINT.search(question):
+            yield "Items below reorder level (lowest cover first)", [item_line(r) for r in conn.execute(
+                '''SELECT name, stock, cost, min_limit FROM inventory WHERE stock < min_limit
+                   ORDER BY stock - min_limit, name LIMIT ?''', (k,))]
+        items = self._search(conn, '''SELECT i.name, i.stock, i.cost, i.min_limit FROM inventory_fts
+                                      JOIN inventory i ON i.id = inventory_fts.rowid
+                                      WHERE inventory_fts MATCH ? ORDER BY rank LIMIT ?''', (query, k)) if query else []
+        insights = self._search(conn, '''SELECT w.summary, w.sentiment, w.revenue FROM insights_fts
+                                         JOIN whatsapp_insights w ON w.id = insights_fts.rowid
+                                         WHERE insights_fts MATCH ? ORDER BY rank LIMIT ?''', (query, k)) if query else []
+        if not items and not insights: # nothing matched: the most valuable stock and the latest chatter
+            items = conn.execute('''SELECT name, stock, cost, min_limit FROM inventory
+                                    ORDER BY stock * cost DESC LIMIT ?''', (k,)).fetchall()
+            insights = conn.execute('''SELECT summary, sentiment, revenue FROM whatsapp_insights
+                                       ORDER BY id DESC LIMIT ?''', (k,)).fetchall()
+        if INSIGHT_HINT.search(question): # the question is about customers, so their insights go first
+            yield "Relevant WhatsApp insights", [insight_line(r) for r in insights]
+            yield "Relevant inventory", [item_line(r) for r in items]
+        else:
+            yield "Relevant inventory", [item_line(r) for r in items]
+            yield "Relevant WhatsApp insights", [insight_line(r) for r in insights]
+
+    def build(self, conn, question, kpis):
+        """Returns (context, stats): the DATA block for the prompt and what went into it."""
+        remaining, blocks, seen = self.token_budget, [], set()
+        stats = {'rows': 0, 'truncated': False}
+        for title, lines in self._sections(conn, question, kpis):
+            kept = []
+            for line in lines:
+                if line in seen:
+                    continue
+                cost = estimate_tokens(line) + (0 if kept else estimate_tokens(title))
+                if cost > remaining:
+                    stats['truncated'] = True
+                    break
+                remaining -= cost
+                seen.add(line)
+                kept.append(line)
+            if kept:
+                blocks.append(f"{title}:\n" + "\n".join(kept))
+                stats['rows'] += len(kept)
+        context = "\n\n".join(blocks)
+        stats['tokens'] = estimate_tokens(context)
+        return context, stats
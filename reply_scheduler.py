@@ -0,0 +1,179 @@
+"""Delay queue for simulated supplier replies to sent inquiries.
+
+Sending an inquiry stamps `negotiations.reply_due_at`; `ReplyScheduler`
+keeps one timer heap of (due time, negotiation id) and a fixed worker pool,
+so a thousand inquiries cost a thousand heap entries rather than a thousand
+sleeping threads. Replies are processed by negotiation id.
+
+The database stays the source of truth. The loop reads the rows already due
+(an indexed range on `reply_due_at`: restarts, expired leases, inquiries sent
+by a web worker, which can't reach this heap) and sleeps until the earliest
+`reply_due_at` it knows of, but never longer than `poll_interval`, so work
+scheduled by another process waits at most that long. Each worker claims its
+row with a conditional UPDATE that pushes `reply_due_at` forward by `lease`
+seconds, so two schedulers never process the same negotiation and a crashed
+worker's row is picked up again once the lease runs out.
+
+`metrics()` reads the backlog (scheduled, overdue, current lag) from the
+table too, so every process reports the same numbers; the processed/failed
+counters and lag stats are this process's own.
+"""
+import heapq, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def init_reply_schema(conn):
+    columns = {r[1] for r in conn.execute('PRAGMA table_info(negotiations)')}
+    if 'reply_due_at' not in columns: # databases created before the scheduler existed
+        conn.execute('ALTER TABLE negotiations ADD COLUMN reply_due_at REAL')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_negotiations_reply_due ON negotiations(reply_due_at)
+                    WHERE reply_due_at IS NOT NULL''')
+
+
+class ReplyScheduler:
+    """`connect()` must return a context manager yielding a connection that commits on exit.
+
+    `process(neg)` receives the claimed negotiation row and returns the reply analysis text.
+    """
+
+    def __init__(self, connect, process, workers=4, poll_interval=1.0, lease=120.0, retry_delay=30.0):
+        self.connect = connect
+        self.process = process
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self._heap = [] # (due_at, negotiation id)
+        self._queued = set() # ids in the heap or handed to the pool and not yet claimed
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reply-worker')
+        self._workers = workers
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'waiting': 0, 'in_flight': 0,
+                      'lag_last': 0.0, 'lag_max': 0.0, 'lag_total': 0.0}
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    # --- scheduling ---
+    def schedule(self, entries):
+        """Queues (negotiation id, due_at) pairs whose `reply_due_at` is already committed."""
+        if self._thread is None: # not running in this process: the next poll of whichever one runs it picks them up
+            return
+        with self._cond:
+            for neg_id, due_at in entries:
+                if neg_id not in self._queued:
+                    self._queued.add(neg_id)
+                    heapq.heappush(self._heap, (due_at, neg_id))
+            self._cond.notify()
+
+    def sweep(self):
+        """Queues the due replies the heap doesn't know about (restarts, other processes, expired leases).
+
+        Returns the earliest `reply_due_at` still in the future, or None.
+        """
+        now = time.time()
+        with self.connect() as conn:
+            rows = conn.execute('''SELECT id, reply_due_at FROM negotiations
+                                   WHERE reply_due_at <= ? AND status = 'INQUIRY_SENT' ''', (now,)).fetchall()
+            upcoming = conn.execute('''SELECT reply_due_at FROM negotiations
+                                       WHERE reply_due_at > ? AND status = 'INQUIRY_SENT'
+                                       ORDER BY reply_due_at LIMIT 1''', (now,)).fetchone()
+        self.schedule((r[0], r[1]) for r in rows)
+        return upcoming[0] if upcoming else None
+
+    # --- processing ---
+    def _claim(self, neg_id):
+        now = time.time()
+        with self.connect() as conn:
+            return conn.execute('''UPDATE negotiations SET reply_due_at = ?
+                                   WHERE id = ? AND status = 'INQUIRY_SENT' AND reply_due_at <= ?
+                                   RETURNING *''', (now + self.lease, neg_id, now)).fetchone()
+
+    def _run(self, neg_id, due_at):
+        self._count(waiting=-1, in_flight=1)
+        try:
+            neg = self._claim(neg_id)
+            with self._cond: # claimed (due time pushed out by the lease) or gone: sweeps may queue it again
+                self._queued.discard(neg_id)
+            if neg is None: # already answered, rescheduled, or claimed elsewhere
+                self._count(skipped=1)
+                return
+            lag = time.time() - due_at
+            with self._stats_lock:
+                self.stats['lag_last'] = lag
+                self.stats['lag_max'] = max(self.stats['lag_max'], lag)
+                self.stats['lag_total'] += lag
+            try:
+                reply = self.process(neg)
+            except Exception as e:
+                print(f"Supplier Reply Error (negotiation {neg_id}): {e}")
+                retry_at = time.time() + self.retry_delay
+                with self.connect() as conn:
+                    conn.execute('UPDATE negotiations SET reply_due_at = ? WHERE id = ?', (retry_at, neg_id))
+                self._count(failed=1)
+                self.schedule([(neg_id, retry_at)])
+                return
+            with self.connect() as conn:
+                conn.execute('''UPDATE negotiations SET status = 'INVOICE_RECEIVED', last_reply = ?, reply_due_at = NULL
+                                WHERE id = ? AND status = 'INQUIRY_SENT' ''', (reply, neg_id))
+            self._count(processed=1)
+        finally:
+            self._count(in_flight=-1)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                upcoming = self.sweep()
+            except Exception as e:
+                print(f"Reply Scheduler Sweep Error: {e}")
+                upcoming = None
+            with self._cond:
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due_at, neg_id = heapq.heappop(self._heap)
+                    due.append((neg_id, due_at))
+                if not due:
+                    wake = min(t for t in (upcoming, self._heap[0][0] if self._heap else None, now + self.poll_interval)
+                               if t is not None)
+                    self._cond.wait(max(wake - now, 0.0))
+            self._count(waiting=len(due)) # handed to the pool, not started yet
+            for neg_id, due_at in due:
+                self._executor.submit(self._run, neg_id, due_at)
+
+    # --- lifecycle / metrics ---
+    def start(self):
+        if self._thread:
+            return self
+        self._thread = threading.Thread(target=self._loop, name='reply-scheduler', daemon=True)
+        self._thread.start()
+        print(f"⏰ Supplier reply scheduler started ({self._workers} workers).")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._thread = None
+
+    def metrics(self):
+        now = time.time()
+        with self.connect() as conn:
+            scheduled, overdue, oldest_due = conn.execute('''SELECT COUNT(*), COALESCE(SUM(reply_due_at <= ?), 0),
+                                                                  MIN(reply_due_at)
+                                                           FROM negotiations
+                                                           WHERE reply_due_at IS NOT NULL AND status = 'INQUIRY_SENT' ''',
+                                                        (now,)).fetchone()
+        with self._stats_lock:
+            stats = dict(self.stats)
+        handled, lag_total = stats['processed'] + stats['failed'], stats.pop('lag_total')
+        return {'scheduled': scheduled, 'overdue': overdue, 'in_flight': stats.pop('in_flight'),
+                'current_lag': max(0.0, now - oldest_due) if oldest_due else 0.0,
+                'lag_avg': lag_total / handled if handled else 0.0, **stats}
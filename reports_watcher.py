@@ -0,0 +1,261 @@
+"""Event-driven watcher for WhatsApp chat exports dropped into WATCH_DIR.
+
+New or renamed-in `.txt` files are picked up through inotify on Linux, or
+by polling for size/mtime-stable files elsewhere. Each file goes to a
+bounded worker pool. Chat exports are split into message-level chunks
+(grouped up to `chunk_chars`); the chunks pass through the batched
+gatekeeper together and the relevant ones are analyzed in parallel.
+
+Every file and chunk is recorded by content hash in `watch_ledger`
+(pending / processed / ignored / failed), so nothing is sent to the LLM
+twice: a re-dropped file is recognised, a retried file skips the chunks
+that already succeeded, and files that keep failing stop being retried
+after `max_attempts`. Processed and ignored files are removed from the
+folder; failed ones are left in place for inspection.
+"""
+import ctypes, ctypes.util, hashlib, os, re, select, struct, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+# "12/01/24, 10:30 - Name: text" (Android) or "[12/01/24, 10:30:15] Name: text" (iOS)
+MESSAGE_START = re.compile(r"^\[?\d{1,4}[/.\-]\d{1,2}[/.\-]\d{1,4},?\s+\d{1,2}:\d{2}")
+
+
+def init_watch_ledger(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS watch_ledger
+                 (sha256 TEXT NOT NULL, kind TEXT NOT NULL, path TEXT, state TEXT NOT NULL,
+                  attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, updated_at REAL NOT NULL,
+                  PRIMARY KEY (sha256, kind))''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_watch_ledger_state ON watch_ledger(kind, state)')
+
+
+def split_messages(raw_text):
+    """Splits a chat export into messages; continuation lines stay with their message."""
+    messages = []
+    for line in raw_text.splitlines():
+        if MESSAGE_START.match(line) or not messages:
+            messages.append(line)
+        else:
+            messages[-1] += "\n" + line
+    return [m for m in messages if m.strip()]
+
+def chunk_messages(raw_text, chunk_chars=4000):
+    """Groups consecutive messages into chunks of at most ~chunk_chars (a short log stays whole)."""
+    if len(raw_text) <= chunk_chars:
+        return [raw_text] if raw_text.strip() else []
+    chunks, current = [], ""
+    for message in split_messages(raw_text):
+        if current and len(current) + len(message) + 1 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{message}" if current else message
+    if current:
+        chunks.append(current)
+    return chunks
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class _Inotify:
+    IN_CLOSE_WRITE, IN_MOVED_TO = 0x00000008, 0x00000080
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.path = path
+
+    def wait(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data, names, offset = os.read(self.fd, 64 * 1024), [], 0
+        while offset < len(data):
+            _, _, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            names.append(data[offset:offset + length].rstrip(b'\0').decode())
+            offset += length
+        return [os.path.join(self.path, n) for n in names if n]
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Polling:
+    """Fallback: reports files whose size/mtime has been stable for one poll interval."""
+
+    def __init__(self, path, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self._last = {}
+        self._reported = {}
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = {}
+        with os.scandir(self.path) as entries:
+            for e in entries:
+                if e.is_file():
+                    st = e.stat()
+                    current[e.path] = (st.st_size, st.st_mtime_ns)
+        ready = [p for p, sig in current.items() if self._last.get(p) == sig and self._reported.get(p) != sig]
+        self._reported.update((p, current[p]) for p in ready)
+        self._last = current
+        return ready
+
+    def close(self):
+        pass
+
+
+class ReportsWatcher:
+    """`connect()` must return a context manager yielding a connection that commits on exit."""
+
+    def __init__(self, watch_dir, connect, agent, workers=4, chunk_workers=4, chunk_chars=4000,
+                 max_attempts=3, rescan_interval=60.0, poll_interval=2.0, on_file=None):
+        self.watch_dir = watch_dir
+        self.on_file = on_file # on_file(outcome, seconds) after every file handled
+        self.connect = connect
+        self.agent = agent
+        self.chunk_chars = chunk_chars
+        self.max_attempts = max_attempts
+        self.rescan_interval = rescan_interval
+        self.poll_interval = poll_interval
+        self._files = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='watcher-file')
+        self._chunks = ThreadPoolExecutor(max_workers=chunk_workers, thread_name_prefix='watcher-chunk')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # --- ledger ---
+    def _db(self, sql, params=()):
+        with self.connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def prune(self, keep_days):
+        """Forgets processed/ignored files and chunks older than `keep_days`; a copy dropped after that is
+        analysed again. Failed entries are kept for inspection."""
+        with self.connect() as conn:
+            return conn.execute('''DELETE FROM watch_ledger WHERE state IN ('processed', 'ignored')
+                                   AND updated_at < ?''', (time.time() - keep_days * 86400,)).rowcount
+
+    def ledger_state(self, digest, kind='file'):
+        rows = self._db('SELECT state, attempts FROM watch_ledger WHERE sha256=? AND kind=?', (digest, kind))
+        return tuple(rows[0]) if rows else (None, 0)
+
+    def _mark(self, digest, kind, path, state, error=None, attempt=False):
+        self._db('''INSERT INTO watch_ledger (sha256, kind, path, state, attempts, last_error, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(sha256, kind) DO UPDATE SET path=excluded.path, state=excluded.state,
+                        attempts=attempts + excluded.attempts, last_error=excluded.last_error,
+                        updated_at=excluded.updated_at''',
+                 (digest, kind, path, state, int(attempt), error, time.time()))
+
+    # --- processing ---
+    def submit(self, path):
+        if not path.endswith('.txt'):
+            return None
+        with self._lock:
+            if path in self._in_flight:
+                return None
+            self._in_flight.add(path)
+        return self._files.submit(self._process_file, path)
+
+    def _process_chunk(self, file_path, chunk):
+        analysis = self.agent.extract_insights(chunk)
+        if analysis and self.agent.save_insight(chunk, analysis):
+            self._mark(sha256(chunk), 'chunk', file_path, 'processed')
+            return True
+        self._mark(sha256(chunk), 'chunk', file_path, 'failed', "analysis failed", attempt=True)
+        return False
+
+    def pending(self):
+        """Files queued or being processed."""
+        with self._lock:
+            return len(self._in_flight)
+
+    def _process_file(self, path):
+        started = time.perf_counter()
+        outcome = self._handle_file(path)
+        if self.on_file and outcome:
+            self.on_file(outcome, time.perf_counter() - started)
+        return outcome
+
+    def _handle_file(self, path):
+        name = os.path.basename(path)
+        try:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    raw_text = f.read()
+            except FileNotFoundError:
+                return None
+            digest = sha256(raw_text)
+            state, attempts = self.ledger_state(digest)
+            if state in ('processed', 'ignored'):
+                print(f"♻️ {name} was already {state}; removing duplicate from watch folder.")
+                os.remove(path)
+                return state
+            if state == 'failed' and attempts >= self.max_attempts:
+                return state # given up; left in place for inspection
+
+            print(f"📥 New log detected: {name}. Processing autonomously...")
+            self._mark(digest, 'file', path, 'pending')
+            chunks = [c for c in chunk_messages(raw_text, self.chunk_chars)
+                      if self.ledger_state(sha256(c), 'chunk')[0] not in ('processed', 'ignored')]
+            verdicts = self.agent.filter_relevant(chunks) if chunks else []
+            for chunk, relevant in zip(chunks, verdicts):
+                if not relevant:
+                    self._mark(sha256(chunk), 'chunk', path, 'ignored')
+            relevant = [c for c, keep in zip(chunks, verdicts) if keep]
+            results = list(self._chunks.map(lambda c: self._process_chunk(path, c), relevant))
+
+            if not all(results):
+                self._mark(digest, 'file', path, 'failed', f"{results.count(False)} chunk(s) failed", attempt=True)
+                print(f"⚠️ {name}: {results.count(False)}/{len(results)} chunks failed; will retry.")
+                return 'failed'
+            state = 'processed' if results else 'ignored'
+            self._mark(digest, 'file', path, state)
+            print(f"✅ {name} {state} ({len(results)} insight chunk(s)). Removing from watch folder.")
+            os.remove(path)
+            return state
+        except Exception as e:
+            print(f"Watcher Error ({name}): {e}")
+            return 'error'
+        finally:
+            with self._lock:
+                self._in_flight.discard(path)
+
+    # --- event loop ---
+    def _events(self):
+        try:
+            return _Inotify(self.watch_dir)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling '{self.watch_dir}' every {self.poll_interval}s.")
+            return _Polling(self.watch_dir, self.poll_interval)
+
+    def rescan(self):
+        for entry in sorted(os.listdir(self.watch_dir)):
+            self.submit(os.path.join(self.watch_dir, entry))
+
+    def run(self):
+        os.makedirs(self.watch_dir, exist_ok=True)
+        events = self._events()
+        print(f"🤖 Agentic Reports Watcher started. Watching '{self.watch_dir}'...")
+        next_rescan = 0.0 # catch up on files dropped while we were down, then retry failures periodically
+        try:
+            while not self._stop.is_set():
+                if time.monotonic() >= next_rescan:
+                    self.rescan()
+                    next_rescan = time.monotonic() + self.rescan_interval
+                for path in events.wait(timeout=1.0):
+                    self.submit(path)
+        finally:
+            events.close()
+
+    def stop(self):
+        self._stop.set()
+        self._files.shutdown(wait=True)
+        self._chunks.shutdown(wait=True)
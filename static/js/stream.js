@@ -0,0 +1,32 @@
+// POSTs JSON and reads the text/event-stream reply incrementally (EventSource can only GET).
+// Calls onEvent(name, data) per event; plain JSON replies (validation errors) arrive as a single 'done'.
+async function postEventStream(url, body, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+        body: JSON.stringify(body)
+    });
+    if (!(response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+        onEvent('done', await response.json());
+        return;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message', data = '';
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
@@ -0,0 +1,50 @@
+"""Append-only ledger of stock movements, plus a log of inventory imports.
+
+Every change to an item's stock is recorded as one `stock_movements` row:
+the signed delta, the stock level after it, why (`import`, `removed`,
+`receipt`) and a reference (`import:<id>`, `negotiation:<id>`). Triggers
+reject UPDATE and DELETE on the ledger, so the history can only grow.
+
+`inventory_imports` keeps one row per diff import with its delta counts and
+phase timings (see csv_importer.sync_inventory).
+"""
+import json
+
+def init_stock_ledger(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS stock_movements
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, item_name TEXT NOT NULL, delta INTEGER NOT NULL,
+                  stock_after INTEGER, reason TEXT NOT NULL, ref TEXT,
+                  at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0))''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements(item_name, id)')
+    for op in ('UPDATE', 'DELETE'):
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS stock_movements_no_{op.lower()} BEFORE {op} ON stock_movements BEGIN
+                             SELECT RAISE(ABORT, 'stock_movements is append-only'); END''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS inventory_imports
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT,
+                  started_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0),
+                  rows_read INTEGER, added INTEGER, updated INTEGER, unchanged INTEGER, removed INTEGER,
+                  newly_low INTEGER, rejected INTEGER, elapsed REAL, phases TEXT)''')
+
+def record_movement(conn, item_name, delta, reason, ref=None):
+    """Appends one movement for `item_name`, reading the resulting stock level from inventory."""
+    conn.execute('''INSERT INTO stock_movements (item_name, delta, stock_after, reason, ref)
+                    SELECT ?, ?, (SELECT stock FROM inventory WHERE name = ? ORDER BY id LIMIT 1), ?, ?''',
+                 (item_name, delta, item_name, reason, ref))
+
+def item_movements(conn, item_name, limit=100):
+    rows = conn.execute('''SELECT id, delta, stock_after, reason, ref, at FROM stock_movements
+                           WHERE item_name = ? ORDER BY id DESC LIMIT ?''', (item_name, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+def begin_import(conn, source):
+    return conn.execute('INSERT INTO inventory_imports (source) VALUES (?)', (source,)).lastrowid
+
+def finish_import(conn, import_id, report):
+    conn.execute('''UPDATE inventory_imports SET rows_read = ?, added = ?, updated = ?, unchanged = ?, removed = ?,
+                    newly_low = ?, rejected = ?, elapsed = ?, phases = ? WHERE id = ?''',
+                 (report.inserted, report.added, report.updated, report.unchanged, report.removed,
+                  len(report.newly_low), report.rejected, report.elapsed, json.dumps(report.phases), import_id))
+
+def recent_imports(conn, limit=20):
+    rows = conn.execute('SELECT * FROM inventory_imports ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    return [{**dict(r), 'phases': json.loads(r['phases'] or '{}')} for r in rows]
@@ -0,0 +1,41 @@
+"""Background services, as their own process next to the web workers.
+
+Runs the WhatsApp reports watcher, the webhook ingest workers and the
+supplier reply scheduler — everything app.py's web workers leave alone.
+Work reaches it through the database (ingest_queue, negotiations.reply_due_at,
+watch_ledger), so it can be restarted independently; run exactly one.
+
+The counters these services keep (gatekeeper, watcher, reply scheduler, LLM
+calls) live in this process, so it serves its own /metrics on
+WORKER_METRICS_PORT (0 turns it off).
+
+    python worker.py
+    gunicorn -w 4 --threads 8 app:app   # web workers, in another process
+"""
+import os, signal, threading
+
+import app as msme
+from metrics import serve
+
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', 9101))
+
+
+def main():
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    msme.start_background_services()
+    server = serve(msme.metrics, WORKER_METRICS_PORT) if WORKER_METRICS_PORT else None
+    print(f"🛠️ Background worker running (Ctrl+C to stop)."
+          + (f" Metrics on :{WORKER_METRICS_PORT}/metrics." if server else ""))
+    stop.wait()
+    print("🛠️ Stopping background worker...")
+    if server:
+        server.shutdown()
+    msme.ingest_workers.stop(timeout=10)
+    msme.reply_scheduler.stop(timeout=10)
+    msme.reports_watcher.stop()
+
+
+if __name__ == '__main__':
+    main()